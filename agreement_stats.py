@@ -0,0 +1,145 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from get_accuracies import compute_accuracy, compute_fleiss_kappa, load_results
+
+# resamples per batch; bounds the (batch x items) working arrays
+BATCH_SIZE = 1000
+
+
+def latest_responses(results):
+    # repeated answers to the same item (after "Back") keep the last one
+    return results.drop_duplicates(["annotator", "qid"], keep="last")
+
+
+def response_matrix(results):
+    """
+    Annotators x items label matrix (NaN where an annotator did not see an
+    item) plus the true label per item.
+    """
+    results = latest_responses(results)
+    labels = results.pivot(index="annotator", columns="qid", values="label")
+    truth = results.groupby("qid")["true_label"].first().reindex(labels.columns)
+    return labels, truth
+
+
+def bootstrap(results, n_resamples=10000, seed=0, batch_size=BATCH_SIZE):
+    """
+    Bootstrap distributions of accuracy and Fleiss' kappa, resampling both
+    annotators and items with replacement. Each batch of resamples is
+    evaluated at once as resample-weight x response-matrix products.
+    """
+    labels, truth = response_matrix(results)
+    L = labels.to_numpy(dtype=float)
+    answered = ~np.isnan(L)
+    M = answered.astype(float)
+    C = (L == truth.to_numpy()[None, :]).astype(float)
+    Y1 = (L == 1).astype(float)
+    Y0 = (answered & (L == 0)).astype(float)
+    n_ann, n_items = L.shape
+
+    rng = np.random.default_rng(seed)
+    accuracy = np.empty(n_resamples)
+    kappa = np.empty(n_resamples)
+    for start in range(0, n_resamples, batch_size):
+        b = min(batch_size, n_resamples - start)
+        wa = rng.multinomial(n_ann, np.full(n_ann, 1 / n_ann), size=b)
+        wi = rng.multinomial(n_items, np.full(n_items, 1 / n_items), size=b)
+
+        accuracy[start:start + b] = ((wa @ C) * wi).sum(1) / ((wa @ M) * wi).sum(1)
+
+        n1 = wa @ Y1
+        n0 = wa @ Y0
+        n = n0 + n1
+        w = wi * (n >= 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_item = np.where(n >= 2, (n0 * n0 + n1 * n1 - n) / (n * (n - 1)), 0.0)
+            p_mean = (w * p_item).sum(1) / w.sum(1)
+            total = (w * n).sum(1)
+            p1 = (w * n1).sum(1) / total
+            p_exp = p1 * p1 + (1 - p1) * (1 - p1)
+            kappa[start:start + b] = (p_mean - p_exp) / (1 - p_exp)
+    return accuracy, kappa
+
+
+def confidence_interval(samples, level=0.95):
+    alpha = (1 - level) / 2
+    lo, hi = np.nanquantile(samples, [alpha, 1 - alpha])
+    return float(lo), float(hi)
+
+
+def item_agreement(results):
+    """Per-qid rater count, label-1 share, majority agreement, pairwise agreement and accuracy."""
+    labels, truth = response_matrix(results)
+    L = labels.to_numpy(dtype=float)
+    n1 = (L == 1).sum(0)
+    n = (~np.isnan(L)).sum(0)
+    n0 = n - n1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pairwise = (n0 * (n0 - 1) + n1 * (n1 - 1)) / (n * (n - 1))
+        correct = (L == truth.to_numpy()[None, :]).sum(0) / n
+    return pd.DataFrame({
+        "n_raters": n,
+        "share_hiding": n1 / n,
+        "majority_agreement": np.maximum(n0, n1) / n,
+        "pairwise_agreement": pairwise,
+        "accuracy": correct,
+        "true_label": truth.to_numpy(),
+    }, index=labels.columns)
+
+
+def annotator_rates(results):
+    """Per-annotator sensitivity (hiding items caught) and specificity."""
+    positive = results["true_label"] == 1
+    correct = results["true_label"] == results["label"]
+    by = results["annotator"]
+    return pd.DataFrame({
+        "n": by.value_counts(),
+        "accuracy": correct.groupby(by).mean(),
+        "sensitivity": correct[positive].groupby(by[positive]).mean(),
+        "specificity": correct[~positive].groupby(by[~positive]).mean(),
+    }).sort_index()
+
+
+def confusion_matrix(results):
+    return pd.crosstab(results["true_label"], results["label"],
+                       rownames=["true_label"], colnames=["label"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agreement statistics with bootstrap confidence intervals.")
+    parser.add_argument("--results-dir", default="results")
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results_dir = Path(args.results_dir)
+    for phase in (1, 2):
+        results = latest_responses(load_results(results_dir.glob(f"*phase{phase}.csv")))
+        if results.empty:
+            continue
+
+        start = time.perf_counter()
+        accuracy, kappa = bootstrap(results, args.resamples, args.seed)
+        elapsed = time.perf_counter() - start
+
+        print(f"===== Phase {phase} =====")
+        print("Accuracy: {:.3f}  95% CI [{:.3f}, {:.3f}]".format(
+            compute_accuracy(results), *confidence_interval(accuracy)))
+        print("Fleiss' κ: {:.3f}  95% CI [{:.3f}, {:.3f}]".format(
+            compute_fleiss_kappa(results), *confidence_interval(kappa)))
+        print(f"({args.resamples} resamples in {elapsed:.2f}s)")
+        print("\nConfusion matrix:")
+        print(confusion_matrix(results))
+        print("\nPer-annotator rates:")
+        print(annotator_rates(results).round(3))
+        print("\nPer-item agreement:")
+        print(item_agreement(results).round(3))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import logging
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+
+ASSIGNMENTS_DB = "results/assignments.db"
+
+logger = logging.getLogger(__name__)
+
+# an assignment whose session has not completed within this long stops
+# counting towards coverage, so abandoned sessions free their items
+ASSIGNMENT_TIMEOUT = 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    annotator TEXT NOT NULL,
+    phase INTEGER NOT NULL,
+    qid INTEGER NOT NULL,
+    label INTEGER NOT NULL,
+    assigned_at REAL NOT NULL,
+    completed_at REAL,
+    PRIMARY KEY (annotator, phase, qid, label)
+);
+"""
+
+
+def label_quota(n_items):
+    """Items of each label in an n_items assignment."""
+    return {0: n_items // 2, 1: n_items - n_items // 2}
+
+
+def pool_capacity(pool, n_items, target):
+    """Sessions `pool` can give n_items each before every item of some label has `target` raters."""
+    capacity = None
+    for label, quota in label_quota(n_items).items():
+        if quota:
+            sessions = sum(1 for _, l in pool if int(l) == label) * target // quota
+            capacity = sessions if capacity is None else min(capacity, sessions)
+    return capacity
+
+
+class AssignmentScheduler:
+    """
+    Hands each annotator the pool items with the lowest coverage so far,
+    balanced across labels. An item's coverage is the number of annotators
+    who completed it plus those still working on it; an assignment left
+    incomplete for longer than `timeout` seconds no longer counts.
+
+    With a `target`, items that have reached that many raters are not
+    handed out again. The cap is only applied to pools that can fill
+    `expected_sessions` assignments under it (see pool_capacity); for
+    smaller pools it would leave later annotators without items, so it is
+    ignored and a warning logged.
+
+    Assignments live in a SQLite file shared by every session and worker
+    process; each assignment is one short BEGIN IMMEDIATE transaction,
+    which SQLite serialises for us.
+    """
+
+    def __init__(self, db_path=ASSIGNMENTS_DB, timeout=ASSIGNMENT_TIMEOUT, target=None, expected_sessions=None,
+                 busy_timeout=30):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.target = target
+        self.expected_sessions = expected_sessions
+        self.busy_timeout = busy_timeout
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(assignments)")}
+            if "completed_at" not in columns:
+                conn.execute("ALTER TABLE assignments ADD COLUMN completed_at REAL")
+
+    def _connect(self):
+        # one connection per call: sessions run on different threads
+        return sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+
+    def assign(self, annotator, phase, pool, n_items):
+        """
+        Pick n_items (qid, label) pairs from `pool` for `annotator` (the
+        whole pool if None), half of each label, preferring the
+        least-covered items. Fewer are returned, with a warning, only when
+        the target leaves too few items. Asking again for the same
+        annotator and phase returns the original assignment and marks it
+        active again. Pairs are returned in pool order so seeded shuffles
+        stay reproducible.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                chosen = set(conn.execute(
+                    "SELECT qid, label FROM assignments WHERE annotator = ? AND phase = ?",
+                    (annotator, phase),
+                ).fetchall())
+                if chosen:
+                    conn.execute(
+                        "UPDATE assignments SET assigned_at = ? "
+                        "WHERE annotator = ? AND phase = ? AND completed_at IS NULL",
+                        (now, annotator, phase),
+                    )
+                else:
+                    chosen = self._choose(conn, annotator, phase, pool, n_items, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [pair for pair in pool if tuple(pair) in chosen]
+
+    def target_for(self, pool, n_items):
+        """The rater cap to apply to `pool`, or None if there is none or the pool is too small for it."""
+        if self.target is None or self.expected_sessions is None:
+            return self.target
+        capacity = pool_capacity(pool, n_items, self.target)
+        if capacity < self.expected_sessions:
+            logger.warning("A pool of %d items with %d per annotator serves %d sessions at %d raters per item, "
+                           "fewer than the %d expected; not capping raters",
+                           len(pool), n_items, capacity, self.target, self.expected_sessions)
+            return None
+        return self.target
+
+    def _choose(self, conn, annotator, phase, pool, n_items, now):
+        pool = [(int(q), int(l)) for q, l in pool]
+        n_items = len(pool) if n_items is None else n_items
+        target = self.target_for(pool, n_items)
+        coverage = self._coverage(conn, phase, now)
+
+        chosen = set()
+        used_qids = set()
+        n_each = label_quota(n_items)
+        for label in (0, 1):
+            candidates = [(q, l) for q, l in pool if l == label and q not in used_qids]
+            if target is not None:
+                candidates = [p for p in candidates if coverage.get(p, 0) < target]
+            # ties broken per annotator so concurrent sessions spread out
+            candidates.sort(key=lambda p: (coverage.get(p, 0), zlib.crc32(f"{annotator}:{p[0]}".encode())))
+            for pair in candidates[:n_each[label]]:
+                chosen.add(pair)
+                used_qids.add(pair[0])
+        if len(chosen) < n_items:
+            logger.warning("%s gets %d of %d random items in phase %s: the others already have %s raters",
+                           annotator, len(chosen), n_items, phase, target)
+
+        conn.executemany(
+            "INSERT INTO assignments (annotator, phase, qid, label, assigned_at) VALUES (?, ?, ?, ?, ?)",
+            [(annotator, phase, q, l, now) for q, l in chosen],
+        )
+        return chosen
+
+    def _coverage(self, conn, phase, now):
+        return {(q, l): n for q, l, n in conn.execute(
+            "SELECT qid, label, COUNT(*) FROM assignments "
+            "WHERE phase = ? AND (completed_at IS NOT NULL OR assigned_at >= ?) "
+            "GROUP BY qid, label",
+            (phase, now - self.timeout),
+        )}
+
+    def complete(self, annotator, phase):
+        """Mark `annotator`'s assignment for `phase` as done; it then counts towards coverage for good."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE assignments SET completed_at = ? "
+                "WHERE annotator = ? AND phase = ? AND completed_at IS NULL",
+                (time.time(), annotator, phase),
+            )
+
+    def coverage(self, phase):
+        """{(qid, label): annotators who completed the item or are working on it} for one phase."""
+        with closing(self._connect()) as conn:
+            return self._coverage(conn, phase, time.time())
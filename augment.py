@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from bundle import refresh
+from io_utils import atomic_path, file_digest
+
+CHUNK_SIZE = 100_000
+
+
+def manifest_path(out_path):
+    return f"{out_path}.manifest.json"
+
+
+def parse_filter(text):
+    """'label=0' or 'label!=0,1' -> (column, negate, values)."""
+    negate = "!=" in text
+    column, _, values = text.partition("!=" if negate else "=")
+    if not column or not values:
+        raise argparse.ArgumentTypeError(f"expected COLUMN=VALUES or COLUMN!=VALUES, got {text!r}")
+    return column.strip(), negate, values.split(",")
+
+
+def filter_mask(chunk, filters):
+    # cells are read as text, so filter values match the CSV as written
+    mask = pd.Series(True, index=chunk.index)
+    for column, negate, values in filters:
+        hit = chunk[column].isin(values)
+        mask &= ~hit if negate else hit
+    return mask
+
+
+def read_chunks(path, chunksize, usecols=None):
+    # everything as text: rows pass through unchanged and every chunk has the same dtypes
+    return pd.read_csv(path, dtype=str, keep_default_na=False, usecols=usecols, chunksize=chunksize)
+
+
+def read_header(path):
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def build_key_index(path, key, chunksize=CHUNK_SIZE):
+    """Hashed index of the distinct `key` values in `path`, read one column at a time."""
+    # per-chunk uniques, concatenated once: appending to an Index copies it every time
+    chunks = [chunk[key].unique() for chunk in read_chunks(path, chunksize, usecols=[key])]
+    return pd.Index(np.concatenate(chunks) if chunks else [], dtype=object).unique()
+
+
+def file_state(path, previous=None):
+    """Size, mtime and sha256 of `path`; the hash is reused while size and mtime are unchanged."""
+    st = os.stat(path)
+    state = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if previous and all(previous.get(k) == state[k] for k in ("path", "size", "mtime_ns")):
+        state["sha256"] = previous["sha256"]
+    else:
+        state["sha256"] = file_digest(path)
+    return state
+
+
+def input_digests(manifest):
+    return [(s["path"], s["sha256"]) for s in [manifest["base"]] + manifest["sources"]]
+
+
+def load_manifest(out_path):
+    try:
+        with open(manifest_path(out_path)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def augment(base, sources, out_path, key="qid", filters=(), chunksize=CHUNK_SIZE, force=False):
+    """
+    Write `base` followed by the rows of each source whose `key` is not in
+    `base` and that pass `filters`. Every file is streamed in chunks; only
+    the distinct base keys are held in memory. Columns are the base columns
+    followed by any columns only the sources have.
+
+    A manifest of input hashes and options is written next to the output;
+    when it still matches, nothing is rewritten. If the output is part of
+    the dataset bundle (see bundle.py), its entry there is refreshed.
+    Returns the manifest.
+    """
+    previous = load_manifest(out_path) or {}
+    old_inputs = {s["path"]: s for s in [previous.get("base", {})] + previous.get("sources", []) if s}
+    options = {"key": key, "filters": [list(f) for f in filters]}
+    inputs = {
+        "base": file_state(base, old_inputs.get(base)),
+        "sources": [file_state(s, old_inputs.get(s)) for s in sources],
+    }
+    if not force and os.path.exists(out_path) and previous.get("output"):
+        unchanged = previous.get("options") == options and input_digests(previous) == input_digests(inputs)
+        if unchanged and file_state(out_path, previous["output"])["sha256"] == previous["output"]["sha256"]:
+            print(f"{out_path} is up to date")
+            refresh([out_path])
+            return previous
+
+    columns = read_header(base)
+    for source in sources:
+        columns += [c for c in read_header(source) if c not in columns]
+
+    base_keys = build_key_index(base, key, chunksize)
+    counts = {base: 0, **{s: 0 for s in sources}}
+    with atomic_path(out_path) as tmp:
+        with open(tmp, "w", newline="") as f:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+            for chunk in read_chunks(base, chunksize):
+                chunk.reindex(columns=columns, fill_value="").to_csv(f, header=False, index=False)
+                counts[base] += len(chunk)
+            for source in sources:
+                for chunk in read_chunks(source, chunksize):
+                    # anti-join: get_indexer probes the index's hash table, -1 means no match
+                    keep = (base_keys.get_indexer(chunk[key]) == -1) & filter_mask(chunk, filters).to_numpy()
+                    chunk = chunk[keep]
+                    chunk.reindex(columns=columns, fill_value="").to_csv(f, header=False, index=False)
+                    counts[source] += len(chunk)
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "options": options,
+        **inputs,
+        "output": {**file_state(out_path), "rows": counts},
+    }
+    with atomic_path(manifest_path(out_path)) as tmp:
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+    print(f"Wrote {out_path}: {counts[base]} base rows + "
+          + ", ".join(f"{n} from {s}" for s, n in counts.items() if s != base))
+    refresh([out_path])
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Append rows from source CSVs whose key is not already in a base CSV.")
+    parser.add_argument("base")
+    parser.add_argument("sources", nargs="+")
+    parser.add_argument("-o", "--out", required=True)
+    parser.add_argument("--key", default="qid")
+    parser.add_argument("--where", type=parse_filter, action="append", default=[],
+                        help="keep source rows where COLUMN=V1[,V2...] (or COLUMN!=...); repeatable")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--force", action="store_true", help="rewrite even if the inputs are unchanged")
+    args = parser.parse_args()
+
+    augment(args.base, args.sources, args.out, args.key, args.where, args.chunksize, args.force)
+
+
+if __name__ == "__main__":
+    main()
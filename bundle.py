@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import sys
+
+from io_utils import atomic_path, file_digest
+
+MANIFEST_FILE = "datasets.json"
+# size/mtime of files already hashed on this machine; lets validate() skip re-reading them
+STATE_FILE = os.path.join(".cache", "bundle_state.json")
+
+BUNDLE_FILES = ["phase1.csv", "phase2dpo_augmented.csv", "phase2dpo.csv", "dpo_outputs.csv", "tmp.csv"]
+
+
+class BundleError(Exception):
+    pass
+
+
+def bundle_version(files):
+    """Short content hash over every file's digest; changes whenever any file does."""
+    h = hashlib.sha256()
+    for name in sorted(files):
+        entry = files[name]
+        h.update(f"{name}\0{entry.get('sha256', entry.get('same_as'))}\n".encode())
+    return h.hexdigest()[:12]
+
+
+def _record(name, digest):
+    """
+    Manifest entry for `name`: its row count and schema, with the columnar
+    cache (and logit array and output sketches) built next to it if missing.
+    """
+    import pandas as pd
+    import pyarrow.feather as feather
+    from data_cache import build_cache, cache_path, load_logits
+    from pair_similarity import load_sketches
+
+    path = cache_path(name, digest)
+    if not os.path.exists(path):
+        build_cache(name, digest)
+    table = feather.read_table(path, memory_map=True)
+    if "output_logits" in table.column_names:
+        load_logits(name, digest=digest)
+    if "model_output" in table.column_names:
+        load_sketches(name, digest=digest)
+    # the file's own columns, typed as parsed; the cache's derived columns are left out
+    header = pd.read_csv(name, nrows=0).columns
+    return {
+        "sha256": digest,
+        "size": os.path.getsize(name),
+        "rows": table.num_rows,
+        "schema": {field.name: str(field.type) for field in table.schema if field.name in header},
+        "cache": path,
+    }
+
+
+def _write_manifest(files, manifest_path=MANIFEST_FILE):
+    manifest = {"bundle_version": bundle_version(files), "files": files}
+    with atomic_path(manifest_path) as tmp:
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+    return manifest
+
+
+def build(names=BUNDLE_FILES, manifest_path=MANIFEST_FILE):
+    """
+    Hash every file, record it (see _record()) and write the manifest. Files
+    whose content is identical to an earlier one are recorded as aliases
+    and share its caches.
+    """
+    files = {}
+    by_digest = {}
+    for name in names:
+        digest = file_digest(name)
+        if digest in by_digest:
+            files[name] = {"same_as": by_digest[digest]}
+        else:
+            by_digest[digest] = name
+            files[name] = _record(name, digest)
+    return _write_manifest(files, manifest_path)
+
+
+def refresh(names, manifest_path=MANIFEST_FILE):
+    """
+    Re-record `names` in the manifest after they were rewritten (augment.py
+    calls this for its output), leaving the other entries as they are.
+    Names the manifest does not list are ignored. Aliases of a changed file
+    keep its old content, so the first of them that still exists takes over
+    the old entry and the others point at it; aliases without a file are
+    dropped. Returns the manifest, or None if there is none.
+    """
+    manifest = _load_json(manifest_path)
+    if manifest is None:
+        return None
+    files = manifest["files"]
+    changed = False
+    for name in names:
+        if name not in files:
+            continue
+        _, old_digest = resolve(manifest, name)
+        digest = file_digest(name)
+        if digest == old_digest:
+            continue
+        changed = True
+
+        aliases = [a for a, entry in files.items() if entry.get("same_as") == name]
+        heir = next((a for a in aliases if os.path.exists(a)), None)
+        for alias in aliases:
+            del files[alias]
+        if heir is not None:
+            files[heir] = _record(heir, old_digest)
+            files.update({a: {"same_as": heir} for a in aliases if a != heir and os.path.exists(a)})
+
+        same = [other for other, entry in files.items() if other != name and entry.get("sha256") == digest]
+        files[name] = {"same_as": same[0]} if same else _record(name, digest)
+
+    return _write_manifest(files, manifest_path) if changed else manifest
+
+
+def _load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def resolve(manifest, name):
+    """Canonical file for `name` (aliases point at the first identical file) and its digest."""
+    entry = manifest["files"].get(name)
+    if entry is None:
+        raise BundleError(f"{name} is not in the dataset bundle")
+    if "same_as" in entry:
+        name = entry["same_as"]
+        entry = manifest["files"][name]
+    return name, entry["sha256"]
+
+
+def validate(names=None, manifest_path=MANIFEST_FILE, state_path=STATE_FILE):
+    """
+    Load the manifest and check the files behind `names` (every file in it
+    if None) against it. Aliases are checked through the file they point
+    at, so only the files a caller actually reads have to be present. A
+    file is only hashed when its size or mtime differs from the last
+    verified state, so a normal startup is a stat() per file.
+    """
+    manifest = _load_json(manifest_path)
+    if manifest is None:
+        raise BundleError(f"{manifest_path} is missing; run `python bundle.py`")
+    state = _load_json(state_path) or {}
+    changed = False
+
+    checked = set()
+    for name in manifest["files"] if names is None else names:
+        name, expected = resolve(manifest, name)
+        if name in checked:
+            continue
+        checked.add(name)
+        try:
+            st = os.stat(name)
+        except FileNotFoundError:
+            raise BundleError(f"{name} is missing") from None
+        known = state.get(name)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            digest = known["sha256"]
+        else:
+            digest = file_digest(name)
+            state[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+            changed = True
+        if digest != expected:
+            raise BundleError(f"{name} has changed since {manifest_path} was built; run `python bundle.py`")
+
+    if changed:
+        with atomic_path(state_path) as tmp:
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+    return manifest
+
+
+def main():
+    names = sys.argv[1:] or BUNDLE_FILES
+    manifest = build(names)
+    print(f"Bundle {manifest['bundle_version']}:")
+    for name, entry in manifest["files"].items():
+        if "same_as" in entry:
+            print(f"    {name}: same content as {entry['same_as']}")
+        else:
+            print(f"    {name}: {entry['rows']} rows, {len(entry['schema'])} columns, sha256 {entry['sha256'][:12]}")
+
+
+if __name__ == "__main__":
+    main()
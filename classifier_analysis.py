@@ -0,0 +1,143 @@
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from agreement_stats import latest_responses
+from data_cache import load_columns, load_logits
+from get_accuracies import load_results
+
+PHASE_FILES = {1: "phase1.csv", 2: "phase2dpo_augmented.csv"}
+
+# logit index for "hiding"; classifier_decision in the CSVs is the argmax
+HIDING = 1
+
+
+def softmax(logits):
+    z = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def classifier_items(csv_path):
+    """
+    One row per (qid, label) with the classifier's margin (hiding logit minus
+    the best other logit), P(hiding) and decision. Rows without logits are
+    dropped; duplicated pairs keep their first row, like ItemStore.
+    """
+    items = load_columns(csv_path, ["qid", "label"])
+    logits = np.asarray(load_logits(csv_path), dtype=np.float64)
+    others = np.delete(logits, HIDING, axis=1)
+    items["margin"] = logits[:, HIDING] - others.max(axis=1)
+    items["p_hiding"] = softmax(logits)[:, HIDING]
+    items["classifier_decision"] = logits.argmax(axis=1)
+    items = items[np.isfinite(items["margin"])]
+    return items.drop_duplicates(["qid", "label"]).reset_index(drop=True)
+
+
+def join_responses(results, items):
+    """Latest human response per annotator and item, with the classifier columns for that item."""
+    items = items.rename(columns={"label": "true_label"})
+    return latest_responses(results).merge(items, on=["qid", "true_label"], how="inner")
+
+
+def margin_vs_accuracy(joined, n_bins=5):
+    """Human and classifier accuracy per quantile bin of classifier confidence |margin|."""
+    bins = pd.qcut(joined["margin"].abs(), n_bins, duplicates="drop")
+    human = joined["label"] == joined["true_label"]
+    classifier = joined["classifier_decision"] == joined["true_label"]
+    return pd.DataFrame({
+        "n": bins.value_counts(sort=False),
+        "human_accuracy": human.groupby(bins, observed=True).mean(),
+        "classifier_accuracy": classifier.groupby(bins, observed=True).mean(),
+    }).rename_axis("abs_margin")
+
+
+def calibration_curve(p, outcome, n_bins=10):
+    """
+    Reliability table for predicted probabilities `p` against 0/1 `outcome`
+    in equal-width bins, plus the expected calibration error.
+    """
+    p = np.asarray(p, dtype=float)
+    outcome = np.asarray(outcome, dtype=float)
+    idx = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    n = np.bincount(idx, minlength=n_bins)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        predicted = np.bincount(idx, weights=p, minlength=n_bins) / n
+        observed = np.bincount(idx, weights=outcome, minlength=n_bins) / n
+    edges = np.linspace(0, 1, n_bins + 1)
+    table = pd.DataFrame({
+        "bin": [f"[{lo:.1f}, {hi:.1f})" for lo, hi in zip(edges[:-1], edges[1:])],
+        "n": n,
+        "mean_predicted": predicted,
+        "observed": observed,
+    })
+    table = table[table["n"] > 0].reset_index(drop=True)
+    ece = float((table["n"] * (table["mean_predicted"] - table["observed"]).abs()).sum() / n.sum())
+    return table, ece
+
+
+def cohen_kappa(a, b):
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    p_o = (a == b).mean()
+    p_e = a.mean() * b.mean() + (1 - a.mean()) * (1 - b.mean())
+    return float((p_o - p_e) / (1 - p_e)) if p_e < 1 else float("nan")
+
+
+def classifier_agreement(joined):
+    """Per-annotator agreement and Cohen's kappa with the classifier's decision, plus an overall row."""
+    agree = joined["label"] == joined["classifier_decision"]
+    by = joined["annotator"]
+    n = by.value_counts()
+    p_o = agree.groupby(by).mean()
+    h1 = (joined["label"] == 1).groupby(by).mean()
+    c1 = (joined["classifier_decision"] == 1).groupby(by).mean()
+    p_e = h1 * c1 + (1 - h1) * (1 - c1)
+    table = pd.DataFrame({"n": n, "agreement": p_o, "kappa": (p_o - p_e) / (1 - p_e)}).sort_index()
+    table.loc["(all)"] = [len(joined), agree.mean(), cohen_kappa(joined["label"], joined["classifier_decision"])]
+    return table.astype({"n": int})
+
+
+def majority_agreement(joined):
+    """Share of items where the human majority vote matches the classifier (ties dropped)."""
+    votes = joined.groupby(["qid", "true_label"]).agg(
+        share_hiding=("label", "mean"), classifier=("classifier_decision", "first"))
+    votes = votes[votes["share_hiding"] != 0.5]
+    majority = (votes["share_hiding"] > 0.5).astype(int)
+    return float((majority == votes["classifier"]).mean()), len(votes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the hiding classifier's logits with human annotations.")
+    parser.add_argument("--results-dir", default="results")
+    parser.add_argument("--bins", type=int, default=5, help="quantile bins for margin vs accuracy")
+    args = parser.parse_args()
+
+    results_dir = Path(args.results_dir)
+    for phase, csv_path in PHASE_FILES.items():
+        items = classifier_items(csv_path)
+        joined = join_responses(load_results(results_dir.glob(f"*phase{phase}.csv")), items)
+        if joined.empty:
+            continue
+
+        print(f"===== Phase {phase} ({len(items)} items with logits, {len(joined)} responses) =====")
+        print("Human vs classifier accuracy by |margin|:")
+        print(margin_vs_accuracy(joined, args.bins).round(3))
+
+        table, ece = calibration_curve(items["p_hiding"], items["label"] == 1)
+        print(f"\nClassifier calibration against the true label (ECE {ece:.3f}):")
+        print(table.round(3).to_string(index=False))
+        table, ece = calibration_curve(joined["p_hiding"], joined["label"] == 1)
+        print(f"\nClassifier P(hiding) against human 'Hiding' votes (ECE {ece:.3f}):")
+        print(table.round(3).to_string(index=False))
+
+        print("\nAgreement with the classifier:")
+        print(classifier_agreement(joined).round(3))
+        share, n_items = majority_agreement(joined)
+        print(f"Human majority vote matches the classifier on {share:.1%} of {n_items} items")
+        print()
+
+
+if __name__ == "__main__":
+    main()
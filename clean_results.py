@@ -1,32 +1,108 @@
 import pandas as pd
+import json
 import os
+import re
 import sys
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 
-def process_csv(respondent_name):
-    original_file = os.path.join("results", f"{respondent_name}_responses_phase1.csv")
-    backup_file = os.path.join("results", f"{respondent_name}_responses_phase1_old.csv")
-    output_file = os.path.join("results", f"{respondent_name}_responses_phase1_max.csv")
+from io_utils import atomic_path, file_digest
 
-    if not os.path.exists(original_file):
-        print(f"File not found: {original_file}")
-        return
-
-    shutil.copy2(original_file, backup_file)
+RESULTS_DIR = "results"
+# raw result files only; *_old.csv / *_max.csv outputs never match
+RESULT_FILE = re.compile(r"^(?P<name>.+)_responses_phase(?P<phase>\d+)\.csv$")
+STATE_FILE = os.path.join(RESULTS_DIR, ".clean_state.json")
 
-    df = pd.read_csv(original_file)
 
+def latest_per_qid(df, keys=("qid",)):
     # Convert timestamp to datetime
     df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
 
-    # Keep only the row with the latest timestamp per qid
-    df_max = df.loc[df.groupby("qid")["timestamp"].idxmax()]
+    # Keep only the row with the latest timestamp per key
+    return df.loc[df.groupby(list(keys))["timestamp"].idxmax()]
+
+
+def respondent_files(respondent_name, phase=1, results_dir=RESULTS_DIR):
+    """
+    `respondent_name`'s result files for `phase`: the per-session
+    <name>_<session>_responses_phase<n>.csv files and the older
+    <name>_responses_phase<n>.csv, if there is one.
+    """
+    pattern = re.compile(rf"^{re.escape(respondent_name)}(?:_[0-9a-f]{{12}})?_responses_phase{phase}\.csv$")
+    return [os.path.join(results_dir, name) for name in sorted(os.listdir(results_dir)) if pattern.match(name)]
+
+
+def process_csv(respondent_name, phase=1):
+    original_files = respondent_files(respondent_name, phase)
+    if not original_files:
+        print(f"File not found: {os.path.join(RESULTS_DIR, f'{respondent_name}_*_responses_phase{phase}.csv')}")
+        return
+    for original_file in original_files:
+        process_file(original_file)
+
+
+def process_file(original_file):
+    backup_file = original_file[:-len(".csv")] + "_old.csv"
+    output_file = original_file[:-len(".csv")] + "_max.csv"
+    shutil.copy2(original_file, backup_file)
+
+    df = pd.read_csv(original_file)
+    df_max = latest_per_qid(df)
 
     df_max.to_csv(output_file, index=False)
     print(f"Processed {original_file}. Backup: {backup_file}. Output: {output_file}.")
 
+
+def dedupe_file(original_file):
+    """Write <file>_max.csv with the latest response per (annotator, qid)."""
+    output_file = original_file[:-len(".csv")] + "_max.csv"
+    df = pd.read_csv(original_file)
+    keys = ["annotator", "qid"] if "annotator" in df else ["qid"]
+    df_max = latest_per_qid(df.dropna(subset=["qid"]), keys)
+    with atomic_path(output_file) as tmp:
+        df_max.to_csv(tmp, index=False)
+    return original_file, output_file, len(df), len(df_max)
+
+
+def process_all(results_dir=RESULTS_DIR, state_file=STATE_FILE, workers=None):
+    """
+    Dedupe every respondent's result files for all phases in one run.
+    Originals are never modified, so no backup copy is made; files whose
+    content hash matches the last run (and whose output exists) are skipped.
+    """
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+
+    digests = {}
+    todo = []
+    for name in sorted(os.listdir(results_dir)):
+        if not RESULT_FILE.match(name):
+            continue
+        path = os.path.join(results_dir, name)
+        digests[path] = file_digest(path)
+        output_file = path[:-len(".csv")] + "_max.csv"
+        if state.get(path) == digests[path] and os.path.exists(output_file):
+            continue
+        todo.append(path)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for original_file, output_file, n_in, n_out in pool.map(dedupe_file, todo):
+            print(f"Processed {original_file} ({n_in} -> {n_out} rows). Output: {output_file}.")
+
+    with atomic_path(state_file) as tmp:
+        with open(tmp, "w") as f:
+            json.dump(digests, f, indent=1, sort_keys=True)
+    print(f"{len(todo)} file(s) processed, {len(digests) - len(todo)} unchanged.")
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python script.py <respondent_name>")
+        print("Usage: python clean_results.py <respondent_name> [phase]")
+        print("       python clean_results.py --all")
         sys.exit(1)
-    process_csv(sys.argv[1])
+    if sys.argv[1] == "--all":
+        process_all()
+    else:
+        process_csv(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1)
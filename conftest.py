@@ -0,0 +1,4 @@
+import os
+
+# tests import the top-level modules from here; keep their metrics out of results/
+os.environ.setdefault("ANNOTATION_METRICS", "0")
@@ -0,0 +1,111 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from io_utils import atomic_path, file_digest
+from normalize import add_clean_columns
+
+CACHE_DIR = ".cache"
+# bump when the derived columns written by build_cache change
+CACHE_VERSION = 2
+
+
+def cache_path(csv_path, digest, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{digest[:16]}.v{CACHE_VERSION}.arrow")
+
+
+def build_cache(csv_path, digest=None, cache_dir=CACHE_DIR):
+    """
+    Parse `csv_path` once and write it as an uncompressed Arrow file keyed by
+    the CSV's content hash, with cleaned copies of the text columns
+    (see normalize.py) stored next to the raw ones. Older caches for the
+    same CSV are removed.
+    """
+    digest = digest or file_digest(csv_path)
+    path = cache_path(csv_path, digest, cache_dir)
+    table = pa.Table.from_pandas(add_clean_columns(pd.read_csv(csv_path)), preserve_index=False)
+    with atomic_path(path) as tmp:
+        # uncompressed so readers can memory-map the buffers directly
+        feather.write_feather(table, tmp, compression="uncompressed")
+
+    remove_stale(csv_path, path, "arrow", cache_dir)
+    return path
+
+
+def remove_stale(csv_path, keep, ext, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    for stale in glob.glob(os.path.join(cache_dir, f"{stem}.*.{ext}")):
+        if stale != keep:
+            os.remove(stale)
+
+
+def load_columns(csv_path, columns=None, cache_dir=CACHE_DIR, zero_copy=False, digest=None):
+    """
+    Load `columns` (all if None) of `csv_path` from its memory-mapped
+    columnar cache, building the cache first if the CSV has changed.
+
+    With `zero_copy` the frame uses ArrowDtype columns that point straight
+    into the mapped file, so worker processes on one host share a single
+    copy of the data through the page cache.
+
+    Pass the CSV's `digest` when it is already known (e.g. from a validated
+    bundle manifest, see bundle.py) to skip hashing the file.
+    """
+    digest = digest or file_digest(csv_path)
+    path = cache_path(csv_path, digest, cache_dir)
+    if not os.path.exists(path):
+        build_cache(csv_path, digest, cache_dir)
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(types_mapper=pd.ArrowDtype) if zero_copy else table.to_pandas()
+
+
+# -----------------------
+# CLASSIFIER LOGITS
+# -----------------------
+def parse_logits(column):
+    """
+    Parse a column of stringified lists like "[0.57, -1.56]" into an
+    (n_rows, n_logits) float32 array. All rows are joined and handed to
+    numpy's text parser in one call instead of eval/json per row; missing
+    rows come back as NaN.
+    """
+    present = column.dropna()
+    if present.empty:
+        raise ValueError("no logits to parse")
+    widths = present.str.count(",").to_numpy() + 1
+    width = int(widths[0])
+    if (widths != width).any():
+        raise ValueError(f"logit lists have different lengths: {sorted(set(widths.tolist()))}")
+
+    missing = ", ".join(["nan"] * width)
+    text = ",".join(column.fillna(missing).str.strip().str.strip("[]"))
+    values = np.fromstring(text, dtype=np.float32, sep=",")
+    if values.size != len(column) * width:
+        raise ValueError("could not parse every logit")
+    return values.reshape(len(column), width)
+
+
+def logits_path(csv_path, digest, cache_dir=CACHE_DIR):
+    return cache_path(csv_path, digest, cache_dir)[:-len(".arrow")] + ".logits.npy"
+
+
+def load_logits(csv_path, column="output_logits", cache_dir=CACHE_DIR, digest=None):
+    """
+    `column` of `csv_path` as a contiguous float32 array, row-aligned with
+    the CSV. Parsed once per CSV version and cached as .npy; later loads
+    memory-map the file.
+    """
+    digest = digest or file_digest(csv_path)
+    path = logits_path(csv_path, digest, cache_dir)
+    if not os.path.exists(path):
+        logits = parse_logits(load_columns(csv_path, [column], cache_dir, digest=digest)[column])
+        with atomic_path(path) as tmp:
+            # np.save appends .npy to names that lack it
+            with open(tmp, "wb") as f:
+                np.save(f, logits)
+        remove_stale(csv_path, path, "logits.npy", cache_dir)
+    return np.load(path, mmap_mode="r")
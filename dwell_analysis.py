@@ -0,0 +1,127 @@
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from agreement_stats import latest_responses
+from get_accuracies import RESULT_COLUMNS, compute_accuracy, compute_fleiss_kappa, load_results
+
+DWELL_COLUMNS = RESULT_COLUMNS + ["timestamp", "rendered_at", "submitted_at"]
+
+# answers faster than this cannot have followed reading the output
+FAST_SECONDS = 5.0
+# annotators with more than this share of fast answers are flagged as speed-clickers
+SPEED_CLICKER_SHARE = 0.5
+# without recorded render times dwell falls back to the time since the previous
+# answer; longer gaps are breaks, not time spent on the item
+MAX_GAP_SECONDS = 600.0
+
+
+def add_dwell(results, max_gap=MAX_GAP_SECONDS):
+    """
+    Sort by annotator and time and add dwell_seconds per response: submit
+    minus render time where the app recorded both, otherwise the time since
+    the annotator's previous response (NaN for the first one and for gaps
+    over `max_gap`). dwell_source says which was used.
+    """
+    results = results.assign(
+        timestamp=pd.to_datetime(results["timestamp"], format="ISO8601"),
+        rendered_at=pd.to_numeric(results["rendered_at"]),
+        submitted_at=pd.to_numeric(results["submitted_at"]),
+    ).sort_values(["annotator", "timestamp"], kind="stable")
+
+    measured = results["submitted_at"] - results["rendered_at"]
+    gap = results.groupby("annotator")["timestamp"].diff().dt.total_seconds()
+    gap = gap.where(gap <= max_gap)
+    results["dwell_seconds"] = measured.fillna(gap)
+    results["dwell_source"] = np.select([measured.notna(), gap.notna()], ["measured", "timestamps"], "none")
+    return results.reset_index(drop=True)
+
+
+def dwell_summary(results, fast_seconds=FAST_SECONDS):
+    """Per-annotator dwell distribution and share of fast answers, plus an overall row."""
+    dwell = results["dwell_seconds"]
+    fast = (dwell < fast_seconds).astype(float).where(dwell.notna())
+
+    def table(by):
+        quantiles = dwell.groupby(by).quantile([0.1, 0.5, 0.9]).unstack()
+        quantiles.columns = ["p10", "median", "p90"]
+        return pd.DataFrame({
+            "n": dwell.groupby(by).count(),
+            **quantiles,
+            "fast_share": fast.groupby(by).mean(),
+        })
+
+    overall = table(pd.Series("(all)", index=results.index))
+    return pd.concat([table(results["annotator"]).sort_index(), overall]).astype({"n": int})
+
+
+def dwell_vs_accuracy(results, n_bins=4):
+    """
+    Accuracy per quantile bin of dwell time, and the Spearman correlation
+    of dwell time with answering correctly (Pearson on ranks).
+    """
+    known = results[results["dwell_seconds"].notna()]
+    correct = (known["label"] == known["true_label"]).astype(float)
+    bins = pd.qcut(known["dwell_seconds"], n_bins, duplicates="drop")
+    table = pd.DataFrame({
+        "n": bins.value_counts(sort=False),
+        "accuracy": correct.groupby(bins, observed=True).mean(),
+    }).rename_axis("dwell_seconds")
+    rho = known["dwell_seconds"].rank().corr(correct.rank())
+    return table, float(rho)
+
+
+def speed_clickers(summary, share=SPEED_CLICKER_SHARE):
+    """Annotators in a dwell_summary table whose share of fast answers is above `share`."""
+    summary = summary.drop(index="(all)", errors="ignore")
+    return summary.index[summary["fast_share"] > share]
+
+
+def drop_low_effort(results, clickers, fast_seconds=FAST_SECONDS):
+    """Drop fast answers and every answer of `clickers`; answers without a dwell time are kept."""
+    fast = results["dwell_seconds"] < fast_seconds
+    return results[~fast & ~results["annotator"].isin(clickers)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Dwell time per item: distributions, relation to accuracy and speed-clicker filtering.")
+    parser.add_argument("--results-dir", default="results")
+    parser.add_argument("--fast-seconds", type=float, default=FAST_SECONDS)
+    parser.add_argument("--clicker-share", type=float, default=SPEED_CLICKER_SHARE)
+    parser.add_argument("--bins", type=int, default=4, help="quantile bins for dwell vs accuracy")
+    args = parser.parse_args()
+
+    results_dir = Path(args.results_dir)
+    for phase in (1, 2):
+        results = load_results(results_dir.glob(f"*phase{phase}.csv"), columns=DWELL_COLUMNS)
+        if results.empty:
+            continue
+        results = add_dwell(results)
+        sources = results["dwell_source"].value_counts()
+
+        print(f"===== Phase {phase} ({len(results)} responses: "
+              + ", ".join(f"{n} {source}" for source, n in sources.items()) + ") =====")
+        summary = dwell_summary(results, args.fast_seconds)
+        print("Dwell time (s) per annotator:")
+        print(summary.round(2))
+
+        table, rho = dwell_vs_accuracy(results, args.bins)
+        print(f"\nAccuracy by dwell time (Spearman ρ with correctness {rho:.3f}):")
+        print(table.round(3))
+
+        clickers = speed_clickers(summary, args.clicker_share)
+        print(f"\nSpeed-clickers (>{args.clicker_share:.0%} of answers under {args.fast_seconds:g}s): "
+              + (", ".join(clickers) or "none"))
+
+        latest = latest_responses(results)
+        kept = drop_low_effort(latest, clickers, args.fast_seconds)
+        print(f"\n{'':<22}{'responses':>10}{'accuracy':>10}{'Fleiss κ':>10}")
+        for name, subset in [("all", latest), ("low-effort removed", kept)]:
+            print(f"{name:<22}{len(subset):>10}{compute_accuracy(subset):>10.3f}{compute_fleiss_kappa(subset):>10.3f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 import pandas as pd
-import random
-from collections import defaultdict
+import sys
+
+from pair_similarity import pair_features, select_examples
+from pools import POOLS_FILE, build_pools, save_pools
 
 # -----------------------
 # CONFIG
 # -----------------------
 N_FIXED = 6   # total items per fixed list
 N_RANDOM = 8  # total items per random list
+SEED = 0      # same seed + same data -> same pools
+N_EXAMPLE_QIDS = 2  # qids per examples page, each shown with both outputs
+# show the qids whose honest and hiding outputs differ most (False: least)
+EXAMPLES_MOST_DISTINGUISHABLE = True
 
 # -----------------------
 # EXCLUSIONS
@@ -25,67 +31,51 @@ EXCLUDE_PHASE2 = {
     (3379, 0), (3379, 1),
 }
 
-# -----------------------
-# LOAD DATA
-# -----------------------
-phase1_df = pd.read_csv("phase1.csv")
-phase2_df = pd.read_csv("phase2dpo_augmented.csv")
-
-# Convert to set of (qid, label) pairs for uniqueness
-phase1_pairs = set(zip(phase1_df.qid, phase1_df.label))
-phase2_pairs = set(zip(phase2_df.qid, phase2_df.label))
-
-# -----------------------
-# FILTER EXCLUSIONS
-# -----------------------
-phase1_filtered = list(phase1_pairs - EXCLUDE_PHASE1 - EXCLUDE_PHASE2)
-phase2_filtered = list(phase2_pairs - EXCLUDE_PHASE2)
 
-# -----------------------
-# FUNCTION TO SAMPLE BALANCED LIST WITHOUT DUPLICATES
-# -----------------------
-def sample_balanced_no_dupes(pairs, n_total):
-    """
-    Sample n_total items with equal 0s and 1s,
-    ensuring no duplicates within the list.
-    """
-    label_groups = defaultdict(list)
-    seen_qids = set()
-    for qid, label in pairs:
-        if qid not in seen_qids:
-            label_groups[label].append((qid, label))
-            seen_qids.add(qid)
-    
-    n_each = n_total // 2
-    sampled = []
-    for label in [0, 1]:
-        if len(label_groups[label]) < n_each:
-            raise ValueError(f"Not enough items with label {label} to sample {n_each}")
-        sampled.extend(random.sample(label_groups[label], n_each))
-    
-    return sampled
-
-# -----------------------
-# SAMPLE FIXED AND RANDOM ITEMS
-# -----------------------
-fixed_phase1 = sample_balanced_no_dupes(phase1_filtered, N_FIXED)
-remaining_phase1 = [p for p in phase1_filtered if p not in fixed_phase1]
-random_phase1 = sample_balanced_no_dupes(remaining_phase1, N_RANDOM)
-
-fixed_phase2 = sample_balanced_no_dupes(phase2_filtered, N_FIXED)
-remaining_phase2 = [p for p in phase2_filtered if p not in fixed_phase2]
-random_phase2 = sample_balanced_no_dupes(remaining_phase2, N_RANDOM)
-
-# -----------------------
-# PRINT RESULTS
-# -----------------------
 def print_pairs(name, pairs):
     print(f"\n{name} = [")
     for qid, label in pairs:
         print(f"    ({qid}, {label}),")
     print("]")
 
-print_pairs("FIXED_PHASE1", fixed_phase1)
-print_pairs("RANDOM_PHASE1", random_phase1)
-print_pairs("FIXED_PHASE2", fixed_phase2)
-print_pairs("RANDOM_PHASE2", random_phase2)
+
+def main(seed=SEED, out=POOLS_FILE):
+    # -----------------------
+    # LOAD DATA
+    # -----------------------
+    phase1_df = pd.read_csv("phase1.csv", usecols=["qid", "label"])
+    phase2_df = pd.read_csv("phase2dpo_augmented.csv", usecols=["qid", "label"])
+
+    phase1_pairs = zip(phase1_df.qid, phase1_df.label)
+    phase2_pairs = zip(phase2_df.qid, phase2_df.label)
+
+    # -----------------------
+    # PICK EXAMPLE PAIRS
+    # -----------------------
+    # qids ranked by how different their two outputs are (see pair_similarity.py)
+    examples1 = select_examples(pair_features("phase1.csv"), N_EXAMPLE_QIDS, EXAMPLES_MOST_DISTINGUISHABLE)
+    examples2 = select_examples(pair_features("phase2dpo_augmented.csv"), N_EXAMPLE_QIDS,
+                                EXAMPLES_MOST_DISTINGUISHABLE, exclude_qids={qid for qid, _ in examples1})
+
+    # -----------------------
+    # SAMPLE FIXED AND RANDOM ITEMS
+    # -----------------------
+    exclude1 = EXCLUDE_PHASE1 | EXCLUDE_PHASE2 | set(examples1) | set(examples2)
+    exclude2 = EXCLUDE_PHASE2 | set(examples2)
+    pools = {
+        "phase1": {"examples": examples1, **build_pools(phase1_pairs, N_FIXED, N_RANDOM, seed, exclude1)},
+        "phase2": {"examples": examples2, **build_pools(phase2_pairs, N_FIXED, N_RANDOM, seed, exclude2)},
+    }
+
+    for phase in (1, 2):
+        print_pairs(f"EXAMPLES_PHASE{phase}", pools[f"phase{phase}"]["examples"])
+        print_pairs(f"FIXED_PHASE{phase}", pools[f"phase{phase}"]["fixed"])
+        print_pairs(f"RANDOM_POOL_PHASE{phase}", pools[f"phase{phase}"]["random"])
+
+    save_pools(pools, out, seed)
+    print(f"\nWrote {out}")
+
+
+if __name__ == "__main__":
+    # python examples.py [seed] [output file]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SEED, sys.argv[2] if len(sys.argv) > 2 else POOLS_FILE)
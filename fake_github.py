@@ -0,0 +1,195 @@
+import base64
+import hashlib
+import json
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGitHub:
+    """
+    In-memory stand-in for the parts of the GitHub REST API the app uses:
+    the contents API (GET/PUT) and the Git data API (refs, commits, blobs,
+    trees). Point GITHUB_API_URL at `url` to upload against it locally.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, branch="main", latency=0.0):
+        self.branch = branch
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.request_count = 0
+        self.commit_count = 0
+        # answer this many upcoming requests with 503, to exercise retries
+        self.fail_requests = 0
+        # refuse every ref update, like a protected branch
+        self.protected = False
+
+        root_tree = self._put_tree({})
+        self.refs = {branch: self._put_commit(root_tree, [], "init")}
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                if fake.latency:
+                    threading.Event().wait(fake.latency)
+                status, reply = fake.handle(self.command, self.path, body)
+                self._reply(status, reply)
+
+            do_GET = do_PUT = do_POST = do_PATCH = _handle
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                # clients that go away mid-request (killed workers) are expected
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+
+        self.server = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # -----------------------
+    # STORAGE
+    # -----------------------
+    @staticmethod
+    def _sha(kind, data):
+        return hashlib.sha1(kind.encode() + b"\0" + data).hexdigest()
+
+    def _put_tree(self, entries):
+        sha = self._sha("tree", json.dumps(entries, sort_keys=True).encode())
+        self.trees[sha] = entries
+        return sha
+
+    def _put_commit(self, tree, parents, message):
+        sha = self._sha("commit", json.dumps([tree, parents, message, len(self.commits)]).encode())
+        self.commits[sha] = {"tree": tree, "parents": parents, "message": message}
+        return sha
+
+    def files(self, branch=None):
+        """Current {path: bytes} on `branch`."""
+        with self.lock:
+            tree = self.trees[self.commits[self.refs[branch or self.branch]]["tree"]]
+            return {path: self.blobs[sha] for path, sha in tree.items()}
+
+    # -----------------------
+    # ROUTES
+    # -----------------------
+    def handle(self, method, path, body):
+        with self.lock:
+            self.request_count += 1
+            if self.fail_requests:
+                self.fail_requests -= 1
+                return 503, {"message": "Service Unavailable"}
+            m = re.match(r"^/repos/([^/]+/[^/]+)(?:/(.*))?$", path.split("?")[0])
+            if not m:
+                return 404, {"message": "Not Found"}
+            rest = m.group(2) or ""
+
+            if rest == "" and method == "GET":
+                return 200, {"full_name": m.group(1), "default_branch": self.branch}
+
+            if rest.startswith("contents/"):
+                return self._contents(method, rest[len("contents/"):], body)
+
+            ref = re.match(r"^git/refs?/heads/(.+)$", rest)
+            if ref:
+                branch = ref.group(1)
+                if branch not in self.refs:
+                    return 404, {"message": "Not Found"}
+                if method == "GET":
+                    return 200, {"object": {"sha": self.refs[branch], "type": "commit"}}
+                if method == "PATCH":
+                    if self.protected:
+                        return 422, {"message": "Protected branch update failed"}
+                    new = body["sha"]
+                    if not body.get("force") and self.refs[branch] not in self.commits[new]["parents"]:
+                        return 422, {"message": "Update is not a fast forward"}
+                    self.refs[branch] = new
+                    self.commit_count += 1
+                    return 200, {"object": {"sha": new, "type": "commit"}}
+
+            commit = re.match(r"^git/commits/([0-9a-f]+)$", rest)
+            if commit and method == "GET":
+                c = self.commits.get(commit.group(1))
+                if c is None:
+                    return 404, {"message": "Not Found"}
+                return 200, {"sha": commit.group(1), "tree": {"sha": c["tree"]}, "parents": c["parents"]}
+
+            if rest == "git/blobs" and method == "POST":
+                data = base64.b64decode(body["content"]) if body.get("encoding") == "base64" \
+                    else body["content"].encode()
+                sha = self._sha("blob", data)
+                self.blobs[sha] = data
+                return 201, {"sha": sha}
+
+            if rest == "git/trees" and method == "POST":
+                entries = dict(self.trees.get(body.get("base_tree"), {}))
+                for entry in body["tree"]:
+                    parts = entry["path"].split("/")
+                    if any(part in ("", ".", "..") for part in parts):
+                        return 422, {"message": f"tree.path contains a malformed path component: {entry['path']}"}
+                    entries[entry["path"]] = entry["sha"]
+                return 201, {"sha": self._put_tree(entries)}
+
+            if rest == "git/commits" and method == "POST":
+                sha = self._put_commit(body["tree"], body["parents"], body["message"])
+                return 201, {"sha": sha}
+
+            return 404, {"message": "Not Found"}
+
+    def _contents(self, method, file_path, body):
+        head = self.refs[self.branch]
+        tree = self.trees[self.commits[head]["tree"]]
+        if method == "GET":
+            if file_path not in tree:
+                return 404, {"message": "Not Found"}
+            return 200, {"sha": tree[file_path], "path": file_path,
+                         "content": base64.b64encode(self.blobs[tree[file_path]]).decode()}
+        if method == "PUT":
+            if file_path in tree and body.get("sha") != tree[file_path]:
+                return 409, {"message": "sha does not match"}
+            data = base64.b64decode(body["content"])
+            blob = self._sha("blob", data)
+            self.blobs[blob] = data
+            entries = dict(tree)
+            entries[file_path] = blob
+            new = self._put_commit(self._put_tree(entries), [head], body.get("message", ""))
+            self.refs[self.branch] = new
+            self.commit_count += 1
+            return (200 if file_path in tree else 201), {"content": {"sha": blob, "path": file_path},
+                                                         "commit": {"sha": new}}
+        return 405, {"message": "Method Not Allowed"}
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    fake = FakeGitHub(port=port)
+    print(f"Fake GitHub API listening on {fake.url}")
+    fake.server.serve_forever()
@@ -1,70 +1,125 @@
 import os
-import csv
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from collections import defaultdict, Counter
+import numpy as np
 import pandas as pd
-from statsmodels.stats.inter_rater import fleiss_kappa
 
+from bundle import BundleError, validate
 
-def compute_accuracy(csv_files):
-    total = 0
-    correct = 0
+# the dataset files the results were collected from
+PHASE_FILES = {1: "phase1.csv", 2: "phase2dpo_augmented.csv"}
 
-    for file_path in csv_files:
-        with open(file_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                total += 1
-                if row["true_label"].strip() == row["label"].strip():
-                    correct += 1
+# the only columns the metrics need; model_output is never parsed.
+# bundle_version is empty for results written before it was recorded
+RESULT_COLUMNS = ["annotator", "qid", "true_label", "label", "bundle_version"]
 
-    return (correct / total) if total else 0.0
+# below this many files a process pool costs more than it saves
+PARALLEL_MIN_FILES = 32
 
 
-def compute_fleiss_kappa(csv_files):
-    # qid → list of labels
-    by_qid = defaultdict(list)
+def read_result_file(file_path, columns=RESULT_COLUMNS):
+    df = pd.read_csv(file_path, usecols=lambda c: c in columns or c == "session_id")
+    if "annotator" not in df:
+        df["annotator"] = Path(file_path).name.split("_responses_")[0]
+    if "session_id" in df:
+        # one rater per session, as response_journal.rater_id: "name [session]"
+        session = df["session_id"]
+        df["annotator"] = df["annotator"].where(session.isna(), df["annotator"] + " [" + session.astype(str) + "]")
+    return df.reindex(columns=columns)
 
-    for file_path in csv_files:
-        with open(file_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                qid = row["qid"].strip()
-                label = row["label"].strip()
-                by_qid[qid].append(label)
 
-    # collect all label values seen
-    all_labels = sorted({lbl for labels in by_qid.values() for lbl in labels})
+def load_results(csv_files, workers=None, columns=RESULT_COLUMNS):
+    """Read every result file once into one table of `columns` (missing ones are NaN)."""
+    csv_files = [str(f) for f in csv_files]
+    if not csv_files:
+        return pd.DataFrame(columns=columns)
 
-    # build matrix: rows = items, columns = labels
-    rows = []
-    for qid, labels in by_qid.items():
-        counts = Counter(labels)
-        row = [counts.get(lbl, 0) for lbl in all_labels]
-        rows.append(row)
+    if len(csv_files) >= PARALLEL_MIN_FILES:
+        workers = workers or os.cpu_count()
+        chunksize = max(1, len(csv_files) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(partial(read_result_file, columns=columns), csv_files, chunksize=chunksize))
+    else:
+        frames = [read_result_file(f, columns) for f in csv_files]
+    return pd.concat(frames, ignore_index=True)
 
-    df = pd.DataFrame(rows, columns=all_labels)
 
-    return fleiss_kappa(df.values)
+def label_counts(results):
+    """Items x labels matrix of how many responses gave each label."""
+    return pd.crosstab(results["qid"], results["label"]).to_numpy()
 
 
-def main():
-    results_dir = Path("results")
+def fleiss_kappa(counts):
+    """
+    Fleiss' kappa for an items x categories count matrix. Items may have
+    different numbers of raters (items with fewer than two are ignored);
+    with equal rater counts this matches statsmodels' fleiss_kappa.
+    """
+    counts = np.asarray(counts, dtype=float)
+    n = counts.sum(axis=1)
+    counts = counts[n >= 2]
+    n = n[n >= 2]
+    if not len(n):
+        return float("nan")
+
+    p_item = ((counts * counts).sum(axis=1) - n) / (n * (n - 1))
+    p_cat = counts.sum(axis=0) / n.sum()
+    p_mean = p_item.mean()
+    p_mean_exp = (p_cat * p_cat).sum()
+    return (p_mean - p_mean_exp) / (1 - p_mean_exp)
+
+
+def compute_accuracy(results):
+    if results.empty:
+        return 0.0
+    return float((results["true_label"] == results["label"]).mean())
 
-    phase1_files = list(results_dir.glob("*phase1.csv"))
-    phase2_files = list(results_dir.glob("*phase2.csv"))
 
-    phase1_accuracy = compute_accuracy(phase1_files)
-    phase2_accuracy = compute_accuracy(phase2_files)
+def compute_annotator_accuracy(results):
+    correct = results["true_label"] == results["label"]
+    return correct.groupby(results["annotator"]).mean().sort_index()
 
-    phase1_kappa = compute_fleiss_kappa(phase1_files)
-    phase2_kappa = compute_fleiss_kappa(phase2_files)
 
-    print("Phase 1 accuracy:", phase1_accuracy)
-    print("Phase 1 Fleiss' κ:", phase1_kappa)
+def compute_fleiss_kappa(results):
+    return fleiss_kappa(label_counts(results))
 
-    print("Phase 2 accuracy:", phase2_accuracy)
-    print("Phase 2 Fleiss' κ:", phase2_kappa)
+
+def other_bundle_counts(results, version):
+    """Responses per bundle version other than `version` (unrecorded versions are left out)."""
+    versions = results["bundle_version"].dropna()
+    return versions[versions != version].value_counts()
+
+
+def main():
+    results_dir = Path("results")
+    try:
+        # a stat() per phase file; files are only re-hashed if they were touched
+        version = validate(PHASE_FILES.values())["bundle_version"]
+        print(f"Dataset bundle {version}")
+    except BundleError as e:
+        version = None
+        print(f"Warning: {e}", file=sys.stderr)
+
+    phase1 = load_results(results_dir.glob("*phase1.csv"))
+    phase2 = load_results(results_dir.glob("*phase2.csv"))
+
+    print("Phase 1 accuracy:", compute_accuracy(phase1))
+    print("Phase 1 Fleiss' κ:", compute_fleiss_kappa(phase1))
+
+    print("Phase 2 accuracy:", compute_accuracy(phase2))
+    print("Phase 2 Fleiss' κ:", compute_fleiss_kappa(phase2))
+
+    for phase, results in [(1, phase1), (2, phase2)]:
+        for other, n in other_bundle_counts(results, version).items():
+            print(f"Warning: {n} phase {phase} responses were collected with dataset bundle {other}",
+                  file=sys.stderr)
+
+    for phase, results in [(1, phase1), (2, phase2)]:
+        print(f"\nPhase {phase} accuracy per annotator:")
+        for annotator, accuracy in compute_annotator_accuracy(results).items():
+            print(f"    {annotator}: {accuracy:.3f}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE = os.environ.get("ANNOTATION_METRICS_FILE", "results/metrics.jsonl")
+# set ANNOTATION_METRICS=0 to turn recording off entirely
+ENABLED = os.environ.get("ANNOTATION_METRICS", "1") != "0"
+
+FLUSH_EVERY = 200        # events
+FLUSH_INTERVAL = 5.0     # seconds
+
+
+class MetricsSink:
+    """
+    Buffered JSON-lines sink. record() only appends to a list under a lock;
+    the buffer is written out every FLUSH_EVERY events or FLUSH_INTERVAL
+    seconds, and at interpreter exit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def record(self, event):
+        with self.lock:
+            self.buffer.append(event)
+            due = len(self.buffer) >= FLUSH_EVERY or time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            events, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if not events:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in events))
+
+
+sink = MetricsSink(METRICS_FILE)
+
+
+@contextmanager
+def span(name, **tags):
+    """Time the block; recorded even when it exits through st.stop()/st.rerun()."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sink.record({"type": "span", "name": name, "ms": (time.perf_counter() - start) * 1000,
+                     "ts": time.time(), **tags})
+
+
+def timed(name, **tags):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **tags):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1, **tags):
+    if not ENABLED:
+        return
+    sink.record({"type": "count", "name": name, "n": n, "ts": time.time(), **tags})
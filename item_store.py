@@ -0,0 +1,44 @@
+class ItemStore:
+    """
+    Read-only view over one phase CSV with a hashed (qid, label) -> row index.
+    The index is built once when the store is created; lookups return row
+    positions so callers can use df.iloc without scanning the frame.
+    """
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        keys = zip(self.df["qid"].astype(int), self.df["label"].astype(int))
+        self.index = {}
+        for pos, key in enumerate(keys):
+            # keep the first row for a pair, like the old mask + iloc[0]
+            self.index.setdefault(key, pos)
+
+    def __len__(self):
+        return len(self.df)
+
+    def __contains__(self, pair):
+        qid, label = pair
+        return (int(qid), int(label)) in self.index
+
+    def position(self, qid, label):
+        return self.index.get((int(qid), int(label)))
+
+    def positions(self, pairs):
+        """Row positions for the pairs that exist, plus the pairs that don't."""
+        found = []
+        missing = []
+        for qid, label in pairs:
+            pos = self.index.get((int(qid), int(label)))
+            if pos is None:
+                missing.append((qid, label))
+            else:
+                found.append(pos)
+        return found, missing
+
+    def row(self, qid, label):
+        pos = self.position(qid, label)
+        return None if pos is None else self.df.iloc[pos]
+
+    def rows(self, pairs):
+        found, _ = self.positions(pairs)
+        return self.df.iloc[found].reset_index(drop=True)
@@ -0,0 +1,152 @@
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from response_journal import JOURNAL_DIR, parse_journal_path, rater_id
+
+
+class PhaseTally:
+    """
+    Running accuracy and Fleiss' kappa for one phase. Every response is an
+    O(1) update of per-qid label counts and per-annotator tallies; when an
+    annotator answers the same qid again the newer answer replaces the old.
+    Kappa uses the same unequal-rater form as get_accuracies.fleiss_kappa.
+    """
+
+    def __init__(self):
+        self.responses = {}                       # (annotator, qid) -> (true_label, label)
+        self.counts = defaultdict(lambda: [0, 0])  # qid -> [n_label0, n_label1]
+        self.annotators = defaultdict(lambda: [0, 0])  # annotator -> [correct, total]
+        self.correct = 0
+        self.total = 0
+        # sums over items with at least two raters
+        self.n_items = 0
+        self.sum_p_item = 0.0
+        self.sum_n = 0
+        self.sum_n1 = 0
+
+    def _item_terms(self, qid):
+        n0, n1 = self.counts[qid]
+        n = n0 + n1
+        if n < 2:
+            return 0, 0.0, 0, 0
+        return 1, (n0 * n0 + n1 * n1 - n) / (n * (n - 1)), n, n1
+
+    def _apply(self, annotator, qid, true_label, label, sign):
+        items, p_item, n, n1 = self._item_terms(qid)
+        self.n_items -= items
+        self.sum_p_item -= p_item
+        self.sum_n -= n
+        self.sum_n1 -= n1
+
+        self.counts[qid][label] += sign
+        correct = int(true_label == label)
+        self.annotators[annotator][0] += sign * correct
+        self.annotators[annotator][1] += sign
+        self.correct += sign * correct
+        self.total += sign
+
+        items, p_item, n, n1 = self._item_terms(qid)
+        self.n_items += items
+        self.sum_p_item += p_item
+        self.sum_n += n
+        self.sum_n1 += n1
+
+    def add(self, annotator, qid, true_label, label):
+        key = (annotator, qid)
+        previous = self.responses.get(key)
+        if previous is not None:
+            self._apply(annotator, qid, *previous, sign=-1)
+        self.responses[key] = (true_label, label)
+        self._apply(annotator, qid, true_label, label, sign=1)
+
+    def accuracy(self):
+        return self.correct / self.total if self.total else 0.0
+
+    def annotator_accuracy(self):
+        return {a: c / t for a, (c, t) in sorted(self.annotators.items()) if t}
+
+    def fleiss_kappa(self):
+        if not self.n_items:
+            return float("nan")
+        p_mean = self.sum_p_item / self.n_items
+        p1 = self.sum_n1 / self.sum_n
+        p_mean_exp = p1 * p1 + (1 - p1) * (1 - p1)
+        if p_mean_exp == 1:
+            # every rating so far is the same label; kappa is undefined
+            return float("nan")
+        return (p_mean - p_mean_exp) / (1 - p_mean_exp)
+
+
+class LiveMetrics:
+    """
+    Per-phase PhaseTally fed by tailing the response journals. poll() only
+    reads bytes appended since the previous poll, so refreshing a
+    dashboard never rescans finished responses.
+    """
+
+    def __init__(self, journal_dir=JOURNAL_DIR):
+        self.journal_dir = journal_dir
+        self.phases = defaultdict(PhaseTally)
+        self.offsets = {}
+        self.lock = threading.Lock()
+
+    def add(self, phase, annotator, qid, true_label, label):
+        with self.lock:
+            self.phases[phase].add(annotator, int(qid), int(true_label), int(label))
+
+    def poll(self):
+        """Fold newly journaled responses into the tallies; returns how many were read."""
+        n_new = 0
+        paths = glob.glob(os.path.join(self.journal_dir, "*.jsonl"))
+        paths += glob.glob(os.path.join(self.journal_dir, "*", "*.jsonl"))
+        for path in paths:
+            parsed = parse_journal_path(path, self.journal_dir)
+            if not parsed:
+                continue
+            annotator, session_id, phase = parsed
+            offset = self.offsets.get(path, 0)
+            if os.path.getsize(path) <= offset:
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            # leave a partially written last line for the next poll
+            complete = data[:data.rfind(b"\n") + 1]
+            self.offsets[path] = offset + len(complete)
+            for line in complete.splitlines():
+                r = json.loads(line)
+                self.add(phase, rater_id(annotator, session_id), r["qid"], r["true_label"], r["label"])
+                n_new += 1
+        return n_new
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                phase: {
+                    "responses": tally.total,
+                    "accuracy": tally.accuracy(),
+                    "fleiss_kappa": tally.fleiss_kappa(),
+                    "annotator_accuracy": tally.annotator_accuracy(),
+                }
+                for phase, tally in sorted(self.phases.items())
+            }
+
+
+def main():
+    journal_dir = sys.argv[1] if len(sys.argv) > 1 else JOURNAL_DIR
+    metrics = LiveMetrics(journal_dir)
+    while True:
+        if metrics.poll():
+            for phase, m in metrics.snapshot().items():
+                print(f"Phase {phase}: {m['responses']} responses, "
+                      f"accuracy {m['accuracy']:.3f}, Fleiss' κ {m['fleiss_kappa']:.3f}")
+        time.sleep(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fake_github import FakeGitHub
+from uploader import OUTBOX_DIR, GitHubUploader
+
+APP_FILE = "model_output_annotation.py"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RESULTS_PATH = "results/"
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes held by `obj`, following containers and __slots__."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, "memory_usage") and hasattr(obj, "iloc"):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    return size
+
+
+class SimulatedAnnotator:
+    """Drives one annotator through both phases of the app with streamlit's AppTest."""
+
+    def __init__(self, name, app_path, api_url, timeout=60):
+        from streamlit.testing.v1 import AppTest
+
+        self.name = name
+        self.latencies = []
+        self.at = AppTest.from_file(app_path, default_timeout=timeout)
+        self.at.secrets["GITHUB_TOKEN"] = "loadtest"
+        self.at.secrets["GITHUB_REPO"] = "loadtest/annotations"
+        self.at.secrets["GITHUB_RESULTS_PATH"] = RESULTS_PATH
+        self.at.secrets["GITHUB_API_URL"] = api_url
+
+    def _timed(self, action):
+        start = time.perf_counter()
+        action()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(f"{self.name}: {self.at.exception[0].message}")
+
+    def _has(self, label):
+        return any(b.label == label for b in self.at.button)
+
+    def click(self, label):
+        button = next((b for b in self.at.button if b.label == label), None)
+        if button is None:
+            raise RuntimeError(f"{self.name}: no {label!r} button; page: {[t.value for t in self.at.title]} {[b.label for b in self.at.button]}")
+        self._timed(lambda: button.click().run())
+
+    def _examples(self):
+        while not self._has("Begin Annotation →"):
+            self.click("Next →")
+        self.click("Begin Annotation →")
+
+    def _trials(self, rng):
+        while self._has("Hiding"):
+            self.click("Hiding" if rng.random() < 0.5 else "Not Hiding")
+
+    def run(self, seed=0):
+        rng = np.random.default_rng(seed)
+        self._timed(self.at.run)
+        self._timed(lambda: self.at.text_input[0].input(self.name).run())
+        self._examples()
+        self._trials(rng)
+        self.click("→ Begin Phase 2 Examples")
+        self._examples()
+        self._trials(rng)
+        return self
+
+    def session_bytes(self):
+        return deep_sizeof(self.at.session_state.to_dict())
+
+
+def run_annotator(job):
+    # AppTest is not safe to drive from several threads, so each simulated
+    # annotator runs in a worker process; workers share the working dir like
+    # app replicas on one box would
+    i, workdir, api_url = job
+    os.chdir(workdir)
+    if workdir not in sys.path:
+        sys.path.insert(0, workdir)
+    # AppTest runs the app as __main__; put ours back so the worker can unpickle its next job
+    main_module = sys.modules["__main__"]
+    try:
+        sim = SimulatedAnnotator(f"loadtest{i:04d}", os.path.join(workdir, APP_FILE), api_url).run(seed=i)
+        return sim.latencies, sim.session_bytes()
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+def prepare_workdir(app_dir=APP_DIR):
+    """Copy the app and its data into a scratch dir so results/ stays untouched."""
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    for name in os.listdir(app_dir):
+        if name.endswith((".py", ".csv", ".json")) and name != "requests.jsonl":
+            shutil.copy(os.path.join(app_dir, name), workdir)
+    return workdir
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent annotators against a local GitHub stand-in.")
+    parser.add_argument("--annotators", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds added to each fake API call")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch working directory")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    fake = FakeGitHub(latency=args.api_latency).start()
+
+    print(f"Running {args.annotators} annotators ({args.concurrency} at a time) in {workdir}")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(run_annotator, [(i, workdir, fake.url) for i in range(args.annotators)]))
+    flow_done = time.perf_counter()
+
+    # worker processes may exit with jobs still in the durable outbox; drain them here
+    GitHubUploader("loadtest", "loadtest/annotations", api_url=fake.url, outbox_dir=OUTBOX_DIR)
+    # every annotator uploads a responses file and a seed file per phase
+    expected = 4 * args.annotators
+    while len(fake.files()) < expected and time.perf_counter() - flow_done < 120:
+        time.sleep(0.05)
+    uploads_done = time.perf_counter()
+    fake.stop()
+
+    latencies = [t for clicks, _ in results for t in clicks]
+    sizes = [size for _, size in results]
+    n_files = len(fake.files())
+    print(f"\nClicks: {len(latencies)}  "
+          f"p50 {percentile(latencies, 50):.1f} ms  p90 {percentile(latencies, 90):.1f} ms  "
+          f"p99 {percentile(latencies, 99):.1f} ms  max {max(latencies) * 1000:.1f} ms")
+    print(f"Session state: mean {statistics.mean(sizes) / 1024:.1f} KiB  max {max(sizes) / 1024:.1f} KiB")
+    print(f"Flow wall time: {flow_done - start:.1f} s for {args.annotators} annotators")
+    print(f"Uploads: {n_files}/{expected} files in {fake.commit_count} commits, "
+          f"{n_files / max(uploads_done - start, 1e-9):.1f} files/s "
+          f"({fake.request_count} API requests)")
+
+    if not args.keep:
+        os.chdir(APP_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
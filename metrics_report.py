@@ -0,0 +1,53 @@
+import sys
+import pandas as pd
+
+from instrumentation import METRICS_FILE
+
+
+def load_events(path=METRICS_FILE):
+    return pd.read_json(path, lines=True)
+
+
+def span_summary(events):
+    """count / p50 / p99 / max latency (ms) per span name and page."""
+    spans = events[events["type"] == "span"].copy()
+    if "page" not in spans:
+        spans["page"] = None
+    spans["page"] = spans["page"].fillna("")
+    grouped = spans.groupby(["name", "page"])["ms"]
+    return pd.DataFrame({
+        "count": grouped.size(),
+        "p50_ms": grouped.quantile(0.5),
+        "p99_ms": grouped.quantile(0.99),
+        "max_ms": grouped.max(),
+    })
+
+
+def counter_summary(events):
+    counts = events[events["type"] == "count"]
+    return counts["n"].astype(int).groupby(counts["name"]).sum()
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else METRICS_FILE
+    events = load_events(path)
+
+    print("Latency per span:")
+    print(span_summary(events).round(2))
+
+    totals = counter_summary(events)
+    print("\nCounters:")
+    print(totals)
+    for name in ("item_store", "fragments"):
+        calls, misses = totals.get(f"{name}.call", 0), totals.get(f"{name}.miss", 0)
+        if calls:
+            print(f"{name} cache hit rate: {1 - misses / calls:.1%} ({calls} calls)")
+
+    reruns = events[(events["type"] == "count") & (events["name"] == "rerun")]
+    if not reruns.empty:
+        print("\nReruns per annotator:")
+        print(reruns["n"].astype(int).groupby(reruns["annotator"].fillna("").replace("", "(no name yet)")).sum())
+
+
+if __name__ == "__main__":
+    main()
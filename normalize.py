@@ -0,0 +1,28 @@
+import re
+
+# "[ WP ]"-style codes prepended to prompts
+BRACKET_CODE = re.compile(r"\[.*?\]")
+MARKDOWN_CHARS = re.compile(r"[*_#>~]")
+
+TEXT_COLUMNS = ["prompt", "model_output"]
+CLEAN_SUFFIX = "_clean"
+
+
+def clean_column(name):
+    return f"{name}{CLEAN_SUFFIX}"
+
+
+def clean_series(s):
+    """Vectorised version of the per-string clean_text the app used to run on every render."""
+    return (s.astype(str)
+             .str.replace(BRACKET_CODE, "", regex=True)
+             .str.replace(MARKDOWN_CHARS, "", regex=True)
+             .str.strip())
+
+
+def add_clean_columns(df, columns=TEXT_COLUMNS):
+    """Add a cleaned <col>_clean next to each text column that df has."""
+    for name in columns:
+        if name in df.columns:
+            df.insert(df.columns.get_loc(name) + 1, clean_column(name), clean_series(df[name]))
+    return df
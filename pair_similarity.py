@@ -0,0 +1,199 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data_cache import CACHE_DIR, cache_path, load_columns, remove_stale
+from io_utils import atomic_path, file_digest
+
+PHASE_FILES = {1: "phase1.csv", 2: "phase2dpo_augmented.csv"}
+
+# RE2 pattern (pyarrow); the Unicode spelling of Python's \W
+NON_WORD = r"[^\p{L}\p{N}_]+"
+NUM_HASHES = 64
+# texts tokenised per block (blocks run in parallel when there are several),
+# and tokens hashed per block when building signatures; keeps the token
+# arrays bounded and the (block, NUM_HASHES) temporaries in cache
+ROW_BLOCK = 20_000
+TOKEN_BLOCK = 1 << 14
+# leading sketch columns before the signature
+CHARS, TOKENS = 0, 1
+
+EMPTY = np.iinfo(np.uint64).max
+
+
+def mix64(x):
+    """splitmix64 finaliser, in place: a cheap, well-spread bijection on uint64 arrays."""
+    x ^= x >> 30
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> 27
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> 31
+    return x
+
+
+def token_hashes(texts):
+    """
+    (row, hash) arrays with one entry per distinct lower-cased word token of
+    each text in the Arrow string array `texts`, ordered by row. Splitting
+    and flattening run in Arrow; only the distinct vocabulary is hashed
+    (pd.util.hash_array) and mapped back through the dictionary codes.
+    """
+    words = pc.split_pattern_regex(pc.utf8_lower(pc.fill_null(texts, "")), NON_WORD)
+    tokens = pc.list_flatten(words)
+    rows = pc.list_parent_indices(words)
+    nonempty = pc.not_equal(tokens, "")
+    encoded = tokens.filter(nonempty).dictionary_encode()
+    vocab = pd.util.hash_array(encoded.dictionary.to_numpy(zero_copy_only=False))
+    hashes = vocab[encoded.indices.to_numpy()]
+    rows = rows.filter(nonempty).to_numpy()
+
+    order = np.lexsort((hashes, rows))
+    rows, hashes = rows[order], hashes[order]
+    distinct = np.r_[True, (rows[1:] != rows[:-1]) | (hashes[1:] != hashes[:-1])]
+    return rows[distinct], hashes[distinct]
+
+
+def minhash_signatures(rows, hashes, n_rows, num_hashes=NUM_HASHES):
+    """(n_rows, num_hashes) MinHash signatures; rows without tokens are all EMPTY."""
+    seeds = mix64(np.arange(1, num_hashes + 1, dtype=np.uint64))
+    signatures = np.full((n_rows, num_hashes), EMPTY, dtype=np.uint64)
+    for start in range(0, len(hashes), TOKEN_BLOCK):
+        r = rows[start:start + TOKEN_BLOCK]
+        mixed = mix64(hashes[start:start + TOKEN_BLOCK, None] ^ seeds[None, :])
+        # rows are sorted, so each row's tokens form one run
+        runs = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+        first = r[runs]
+        # a row can straddle two blocks, so combine with what is already there
+        signatures[first] = np.minimum(signatures[first], np.minimum.reduceat(mixed, runs, axis=0))
+    return signatures
+
+
+def sketch_block(texts, num_hashes=NUM_HASHES):
+    """Per-row [chars, distinct tokens, signature...] of an Arrow string array, as one uint64 array."""
+    rows, hashes = token_hashes(texts)
+    sketches = np.empty((len(texts), 2 + num_hashes), dtype=np.uint64)
+    sketches[:, CHARS] = pc.utf8_length(pc.fill_null(texts, "")).to_numpy()
+    sketches[:, TOKENS] = np.bincount(rows, minlength=len(texts))
+    sketches[:, 2:] = minhash_signatures(rows, hashes, len(texts), num_hashes)
+    return sketches
+
+
+def build_sketches(texts, num_hashes=NUM_HASHES, workers=None):
+    blocks = [texts.slice(start, ROW_BLOCK) for start in range(0, len(texts), ROW_BLOCK)]
+    if len(blocks) <= 1:
+        return sketch_block(texts, num_hashes)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(sketch_block, blocks, [num_hashes] * len(blocks))))
+
+
+def sketch_path(csv_path, digest, column="model_output", num_hashes=NUM_HASHES, cache_dir=CACHE_DIR):
+    return cache_path(csv_path, digest, cache_dir)[:-len(".arrow")] + f".{column}.minhash{num_hashes}.npy"
+
+
+def load_sketches(csv_path, column="model_output", num_hashes=NUM_HASHES, cache_dir=CACHE_DIR, digest=None):
+    """
+    Sketches of `column`, row-aligned with the CSV. Built once per CSV
+    version and cached as .npy next to the Arrow cache; later loads
+    memory-map the file.
+    """
+    digest = digest or file_digest(csv_path)
+    path = sketch_path(csv_path, digest, column, num_hashes, cache_dir)
+    if not os.path.exists(path):
+        texts = load_columns(csv_path, [column], cache_dir, zero_copy=True, digest=digest)[column]
+        texts = pa.array(texts)
+        if isinstance(texts, pa.ChunkedArray):
+            texts = texts.combine_chunks()
+        sketches = build_sketches(texts, num_hashes)
+        with atomic_path(path) as tmp:
+            with open(tmp, "wb") as f:
+                np.save(f, sketches)
+        remove_stale(csv_path, path, f"{column}.minhash{num_hashes}.npy", cache_dir)
+    return np.load(path, mmap_mode="r")
+
+
+def pair_positions(items):
+    """Row positions of the label-0 and label-1 item per qid that has both; first row wins, like ItemStore."""
+    first = items[["qid", "label"]].reset_index(drop=True).reset_index().drop_duplicates(["qid", "label"])
+    positions = first.pivot(index="qid", columns="label", values="index")
+    return positions.reindex(columns=[0, 1]).dropna().astype(np.int64)
+
+
+def pair_features(csv_path, column="model_output", digest=None):
+    """
+    One row per qid comparing its honest (label 0) and hiding (label 1)
+    `column`: lengths and their delta, estimated token Jaccard and the
+    token overlap coefficient |A & B| / min(|A|, |B|) derived from it.
+    Everything is computed from the cached sketches.
+    """
+    items = load_columns(csv_path, ["qid", "label"], digest=digest)
+    sketches = load_sketches(csv_path, column, digest=digest)
+    positions = pair_positions(items)
+    a = sketches[positions[0].to_numpy()]
+    b = sketches[positions[1].to_numpy()]
+
+    jaccard = (a[:, 2:] == b[:, 2:]).mean(axis=1)
+    # two texts without any tokens are not similar, just empty
+    jaccard[(a[:, TOKENS] == 0) | (b[:, TOKENS] == 0)] = 0.0
+    n0 = a[:, TOKENS].astype(np.float64)
+    n1 = b[:, TOKENS].astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overlap = np.clip(jaccard * (n0 + n1) / (1 + jaccard) / np.minimum(n0, n1), 0, 1)
+    return pd.DataFrame({
+        "chars_0": a[:, CHARS].astype(np.int64),
+        "chars_1": b[:, CHARS].astype(np.int64),
+        "length_delta": b[:, CHARS].astype(np.int64) - a[:, CHARS].astype(np.int64),
+        "tokens_0": a[:, TOKENS].astype(np.int64),
+        "tokens_1": b[:, TOKENS].astype(np.int64),
+        "token_overlap": np.nan_to_num(overlap),
+        "jaccard": jaccard,
+    }, index=positions.index)
+
+
+def rank_pairs(features, most_distinguishable=True):
+    """qids ordered by how different their two outputs are (lowest Jaccard first), ties by qid."""
+    order = features.sort_index().sort_values("jaccard", ascending=most_distinguishable, kind="stable")
+    return order.index.to_numpy()
+
+
+def select_examples(features, n_qids, most_distinguishable=True, exclude_qids=frozenset()):
+    """
+    (qid, label) example pairs for the `n_qids` most (or least)
+    distinguishable qids, both outputs of each. Which label comes first
+    alternates so annotators cannot learn the order.
+    """
+    ranked = [qid for qid in rank_pairs(features, most_distinguishable) if qid not in exclude_qids]
+    if len(ranked) < n_qids:
+        raise ValueError(f"Only {len(ranked)} qids have both outputs; need {n_qids}")
+    pairs = []
+    for i, qid in enumerate(ranked[:n_qids]):
+        labels = (1, 0) if i % 2 == 0 else (0, 1)
+        pairs.extend((int(qid), label) for label in labels)
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare each qid's honest and hiding outputs and list the most and least similar pairs.")
+    parser.add_argument("files", nargs="*", default=list(PHASE_FILES.values()))
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    for csv_path in args.files:
+        start = time.perf_counter()
+        features = pair_features(csv_path)
+        elapsed = time.perf_counter() - start
+        print(f"===== {csv_path}: {len(features)} paired qids ({elapsed:.2f}s) =====")
+        print(features.describe().loc[["mean", "50%", "min", "max"]].round(3).to_string())
+        for label, most in [("Most distinguishable", True), ("Least distinguishable", False)]:
+            print(f"\n{label}:")
+            print(features.loc[rank_pairs(features, most)[:args.top]].round(3).to_string())
+        print()
+
+
+if __name__ == "__main__":
+    main()
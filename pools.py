@@ -0,0 +1,64 @@
+import json
+import random
+
+from io_utils import atomic_path
+
+POOLS_FILE = "pools.json"
+
+
+def load_pools(path=POOLS_FILE):
+    """{"phase1": {"examples": [(qid, label), ...], "fixed": [...], "random": [...]}, "phase2": {...}}"""
+    with open(path) as f:
+        pools = json.load(f)
+    return {
+        phase: {name: [tuple(pair) for pair in pairs] for name, pairs in lists.items()}
+        for phase, lists in pools.items()
+        if phase.startswith("phase")
+    }
+
+
+def save_pools(pools, path=POOLS_FILE, seed=None):
+    # one line per list keeps pool diffs readable
+    blocks = []
+    for phase, lists in pools.items():
+        lines = [f'  "{name}": {json.dumps([[int(q), int(l)] for q, l in pairs])}' for name, pairs in lists.items()]
+        blocks.append(f' "{phase}": {{\n' + ",\n".join(lines) + "\n }")
+    text = "{\n" + f' "seed": {json.dumps(seed)},\n' + ",\n".join(blocks) + "\n}\n"
+    with atomic_path(path) as tmp:
+        with open(tmp, "w") as f:
+            f.write(text)
+
+
+def qids_by_label(pairs, exclude=frozenset()):
+    """{label: sorted qids} for the (qid, label) pairs not in `exclude`."""
+    groups = {}
+    for qid, label in set(pairs) - set(exclude):
+        groups.setdefault(label, set()).add(qid)
+    return {label: sorted(qids) for label, qids in groups.items()}
+
+
+def sample_balanced(groups, n_total, rng, exclude_qids=frozenset()):
+    """
+    Sample n_total pairs with equal 0s and 1s from {label: sorted qids},
+    never using a qid twice or any qid in `exclude_qids`.
+    """
+    n_each = n_total // 2
+    used = set(exclude_qids)
+    sampled = []
+    for label in [0, 1]:
+        candidates = [qid for qid in groups.get(label, []) if qid not in used]
+        if len(candidates) < n_each:
+            raise ValueError(f"Not enough items with label {label} to sample {n_each}")
+        chosen = rng.sample(candidates, n_each)
+        used.update(chosen)
+        sampled.extend((qid, label) for qid in chosen)
+    return sampled
+
+
+def build_pools(pairs, n_fixed, n_random, seed, exclude=frozenset()):
+    """Fixed and random pools for one phase; the random pool shares no qid with the fixed one."""
+    rng = random.Random(seed)
+    groups = qids_by_label(pairs, exclude)
+    fixed = sample_balanced(groups, n_fixed, rng)
+    random_pool = sample_balanced(groups, n_random, rng, exclude_qids={qid for qid, _ in fixed})
+    return {"fixed": fixed, "random": random_pool}
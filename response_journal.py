@@ -0,0 +1,199 @@
+import glob
+import json
+import os
+import re
+import time
+
+from io_utils import atomic_path, locked
+
+JOURNAL_DIR = "results/journal"
+# a session whose heartbeat is older than this may be taken over by someone
+# entering the same name; while it is fresher the session is left alone
+SESSION_TIMEOUT = 20 * 60
+
+# results/journal/{annotator}/{session_id}_phase{n}.jsonl
+SESSION_JOURNAL = re.compile(r"^(?P<session>[0-9a-f]+)_phase(?P<phase>\d+)\.jsonl$")
+# results/journal/{annotator}_phase{n}.jsonl, written before journals were per session
+LEGACY_JOURNAL = re.compile(r"^(?P<annotator>.+)_phase(?P<phase>\d+)\.jsonl$")
+
+# column layout of results/{annotator}_{session_id}_responses_phase{n}.csv
+CSV_COLUMNS = ["timestamp", "annotator", "session_id", "qid", "true_label", "label", "model_output",
+               "bundle_version", "rendered_at", "submitted_at"]
+# slim results leave out model_output; it can always be joined back from the item CSV
+SLIM_COLUMNS = ["timestamp", "annotator", "session_id", "qid", "true_label", "label", "bundle_version",
+                "rendered_at", "submitted_at"]
+
+
+class ResponseRecord:
+    """
+    One annotator response. Holds only references to the item (qid and its
+    true label), never the model_output text itself. `bundle_version` names
+    the dataset bundle (see bundle.py) the item was shown from.
+    `rendered_at` and `submitted_at` are time.monotonic() seconds in the
+    worker that served the item; only their difference (the dwell time)
+    is meaningful.
+    """
+
+    __slots__ = ("trial", "timestamp", "qid", "true_label", "label", "bundle_version",
+                 "rendered_at", "submitted_at")
+
+    def __init__(self, trial, timestamp, qid, true_label, label, bundle_version=None,
+                 rendered_at=None, submitted_at=None):
+        self.trial = trial
+        self.timestamp = timestamp
+        self.qid = qid
+        self.true_label = true_label
+        self.label = label
+        self.bundle_version = bundle_version
+        self.rendered_at = rendered_at
+        self.submitted_at = submitted_at
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d):
+        # older journal lines also carry annotator/model_output (ignored)
+        # and predate bundle_version and the dwell timestamps (left as None)
+        return cls(*(d.get(name) for name in cls.__slots__))
+
+
+def journal_path(annotator, phase, session_id=None, journal_dir=JOURNAL_DIR):
+    """
+    Journal of one browser session. Sessions are namespaced so two sessions
+    with the same annotator name never append to each other's file.
+    """
+    if session_id is None:
+        return os.path.join(journal_dir, f"{annotator}_phase{phase}.jsonl")
+    return os.path.join(journal_dir, annotator, f"{session_id}_phase{phase}.jsonl")
+
+
+def session_seed_path(annotator, phase, session_id, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, annotator, f"{session_id}_seed_phase{phase}.txt")
+
+
+def parse_journal_path(path, journal_dir=JOURNAL_DIR):
+    """(annotator, session_id, phase) for a journal file, or None. Legacy journals have no session."""
+    name = os.path.basename(path)
+    parent = os.path.dirname(os.path.relpath(path, journal_dir))
+    m = SESSION_JOURNAL.match(name) if parent else LEGACY_JOURNAL.match(name)
+    if not m:
+        return None
+    if parent:
+        return parent, m.group("session"), int(m.group("phase"))
+    return m.group("annotator"), None, int(m.group("phase"))
+
+
+def rater_id(annotator, session_id):
+    """One rater per session: two people who typed the same name are counted apart."""
+    return annotator if session_id is None else f"{annotator} [{session_id}]"
+
+
+def heartbeat_path(annotator, session_id, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, annotator, f"{session_id}.alive")
+
+
+def heartbeat(annotator, session_id, journal_dir=JOURNAL_DIR):
+    """Mark the session as in use; called on every rerun."""
+    path = heartbeat_path(annotator, session_id, journal_dir)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "a").close()
+
+
+def claim_session(annotator, session_id, timeout=SESSION_TIMEOUT, journal_dir=JOURNAL_DIR):
+    """Take over `session_id` if nobody has used it for `timeout` seconds; False while it is in use."""
+    path = heartbeat_path(annotator, session_id, journal_dir)
+    with locked(path):
+        try:
+            if time.time() - os.path.getmtime(path) < timeout:
+                return False
+        except FileNotFoundError:
+            pass
+        heartbeat(annotator, session_id, journal_dir)
+    return True
+
+
+def annotator_sessions(annotator, journal_dir=JOURNAL_DIR):
+    """Session ids with a journal under `annotator`, most recently written first."""
+    latest = {}
+    for path in glob.glob(os.path.join(glob.escape(os.path.join(journal_dir, annotator)), "*.jsonl")):
+        m = SESSION_JOURNAL.match(os.path.basename(path))
+        if m:
+            latest[m.group("session")] = max(latest.get(m.group("session"), 0), os.path.getmtime(path))
+    return sorted(latest, key=latest.get, reverse=True)
+
+
+class ResponseJournal:
+    """
+    Append-only JSON-lines log with one record per click.
+
+    Every append is flushed to the OS, so a crashed or restarted worker loses
+    nothing; fsync (surviving a machine crash) is batched every
+    `fsync_every` records and on sync()/close().
+    """
+
+    def __init__(self, path, fsync_every=8):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.unsynced = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.f = open(path, "a", encoding="utf-8")
+
+    def append(self, record):
+        self.f.write(json.dumps(record.to_dict(), separators=(",", ":")) + "\n")
+        self.f.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        if not self.f.closed:
+            self.sync()
+            self.f.close()
+
+
+def read_journal(path):
+    """ResponseRecords in `path`, skipping a torn last line left by a crash."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(ResponseRecord.from_dict(json.loads(line)))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+def compact(records, annotator, store, csv_path, slim=False, session_id=None):
+    """
+    Write records to `csv_path` in the layout get_accuracies.py reads.
+    model_output is joined back from `store` here, unless `slim` is set.
+    """
+    import pandas as pd
+    df = pd.DataFrame([r.to_dict() for r in records], columns=ResponseRecord.__slots__)
+    df["annotator"] = annotator
+    df["session_id"] = session_id
+    columns = SLIM_COLUMNS
+    if not slim:
+        # items missing from the current store (e.g. after a bundle update) keep an empty output
+        positions = [store.position(qid, label) for qid, label in zip(df["qid"], df["true_label"])]
+        known = [pos is not None for pos in positions]
+        outputs = pd.Series(None, index=df.index, dtype=object)
+        outputs[known] = store.df["model_output"].iloc[[pos for pos in positions if pos is not None]].to_numpy()
+        df["model_output"] = outputs
+        columns = CSV_COLUMNS
+    df = df[columns]
+    with atomic_path(csv_path) as tmp:
+        df.to_csv(tmp, index=False)
+    return csv_path
@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+
+
+def build_trial_order(store, pair_lists, seed):
+    """
+    Row positions (into store.df) of one annotator's trials, in the order
+    they are shown. The shuffle is the same permutation that
+    pd.concat(...).sample(frac=1, random_state=seed) used to produce, so
+    recorded seeds still reproduce the original item order.
+    """
+    positions = []
+    for pairs in pair_lists:
+        found, _ = store.positions(pairs)
+        positions.extend(found)
+    order = pd.Series(positions, dtype=np.int64).sample(frac=1, random_state=seed)
+    return order.to_numpy(dtype=np.int32)
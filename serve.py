@@ -0,0 +1,135 @@
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+APP_FILE = "model_output_annotation.py"
+SERVE_DIR = ".serve"
+PHASE_FILES = ["phase1.csv", "phase2dpo_augmented.csv"]
+
+NGINX_CONF = """\
+# generated by serve.py
+worker_processes auto;
+pid {serve_dir}/nginx.pid;
+error_log {serve_dir}/nginx-error.log;
+
+events {{
+    worker_connections 1024;
+}}
+
+http {{
+    access_log off;
+    client_body_temp_path {serve_dir}/client_body;
+    proxy_temp_path {serve_dir}/proxy;
+    fastcgi_temp_path {serve_dir}/fastcgi;
+    uwsgi_temp_path {serve_dir}/uwsgi;
+    scgi_temp_path {serve_dir}/scgi;
+
+    map $http_upgrade $connection_upgrade {{
+        default upgrade;
+        ''      close;
+    }}
+
+    upstream annotation_app {{
+        # a Streamlit session lives in one worker's memory, so a browser must
+        # keep talking to the same worker: pin clients by address
+        ip_hash;
+{servers}
+    }}
+
+    server {{
+        listen {listen};
+
+        location / {{
+            proxy_pass http://annotation_app;
+            proxy_http_version 1.1;
+            proxy_set_header Host $host;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+            proxy_set_header Upgrade $http_upgrade;
+            proxy_set_header Connection $connection_upgrade;
+            proxy_read_timeout 86400;
+        }}
+    }}
+}}
+"""
+
+
+def worker_ports(base_port, n_workers):
+    return [base_port + i for i in range(n_workers)]
+
+
+def write_nginx_conf(ports, listen, serve_dir=SERVE_DIR):
+    serve_dir = os.path.abspath(serve_dir)
+    os.makedirs(serve_dir, exist_ok=True)
+    servers = "\n".join(f"        server 127.0.0.1:{port};" for port in ports)
+    path = os.path.join(serve_dir, "nginx.conf")
+    with open(path, "w") as f:
+        f.write(NGINX_CONF.format(serve_dir=serve_dir, servers=servers, listen=listen))
+    return path
+
+
+def prepare_caches():
+    # check the dataset bundle and build the Arrow caches once, before the workers map them
+    from bundle import resolve, validate
+    from data_cache import load_columns
+    manifest = validate(PHASE_FILES)
+    for name in PHASE_FILES:
+        csv_path, digest = resolve(manifest, name)
+        load_columns(csv_path, ["qid"], digest=digest)
+    print(f"Dataset bundle {manifest['bundle_version']}")
+
+
+def start_worker(port, extra_args):
+    cmd = [sys.executable, "-m", "streamlit", "run", APP_FILE,
+           "--server.port", str(port), "--server.address", "127.0.0.1",
+           "--server.headless", "true", *extra_args]
+    return subprocess.Popen(cmd)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run several app worker processes behind an nginx reverse proxy with sticky sessions.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8501, help="port the proxy listens on")
+    parser.add_argument("--base-port", type=int, default=8601, help="first worker port")
+    parser.add_argument("--no-proxy", action="store_true", help="only start the workers and write the config")
+    args, extra_args = parser.parse_known_args()
+
+    ports = worker_ports(args.base_port, args.workers)
+    conf = write_nginx_conf(ports, args.port)
+    print(f"Wrote {conf}")
+    prepare_caches()
+
+    procs = [start_worker(port, extra_args) for port in ports]
+    print(f"Started {len(procs)} workers on ports {ports[0]}-{ports[-1]}")
+
+    nginx = shutil.which("nginx")
+    if args.no_proxy:
+        pass
+    elif nginx:
+        procs.append(subprocess.Popen([nginx, "-c", conf, "-g", "daemon off;"]))
+        print(f"Proxy listening on http://localhost:{args.port}")
+    else:
+        print(f"nginx not found; start it with: nginx -c {conf}")
+
+    def stop(*_):
+        for p in procs:
+            p.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        # if any worker dies, take the rest down too so a supervisor can restart the set
+        while all(p.poll() is None for p in procs):
+            time.sleep(1)
+    finally:
+        stop()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
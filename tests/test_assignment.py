@@ -0,0 +1,125 @@
+import logging
+import sqlite3
+import threading
+from collections import Counter
+
+import pytest
+
+import assignment
+from assignment import AssignmentScheduler, pool_capacity
+
+# four qids per label, like a small pools.json random pool
+POOL = [[q, 0] for q in range(1, 5)] + [[q, 1] for q in range(5, 9)]
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(assignment.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "assignments.db")
+
+
+def test_whole_pool_by_default(db, clock):
+    scheduler = AssignmentScheduler(db)
+    for annotator in "abcdefgh":
+        assert scheduler.assign(annotator, 1, POOL, None) == POOL
+    assert set(scheduler.coverage(1).values()) == {8}
+
+
+def test_asking_again_returns_the_same_items(db, clock):
+    scheduler = AssignmentScheduler(db)
+    first = scheduler.assign("a", 1, POOL, 2)
+    scheduler.assign("b", 1, POOL, 2)
+    assert scheduler.assign("a", 1, POOL, 2) == first
+    assert [label for _, label in first] == [0, 1]
+
+
+def test_subsets_spread_over_the_pool(db, clock):
+    scheduler = AssignmentScheduler(db)
+    for annotator in "abcdefgh":
+        scheduler.assign(annotator, 1, POOL, 2)
+    assert set(scheduler.coverage(1).values()) == {2}
+
+
+def test_abandoned_assignments_stop_counting(db, clock):
+    pool = [[1, 0], [2, 0], [3, 1], [4, 1]]
+    scheduler = AssignmentScheduler(db, timeout=60)
+    done = scheduler.assign("done", 1, pool, 2)
+    scheduler.complete("done", 1)
+    abandoned = scheduler.assign("abandoned", 1, pool, 2)
+
+    clock.now += 61
+    coverage = scheduler.coverage(1)
+    assert all(coverage[tuple(pair)] == 1 for pair in done)
+    assert not any(tuple(pair) in coverage for pair in abandoned)
+    # the freed items are the least covered again
+    assert scheduler.assign("next", 1, pool, 2) == abandoned
+
+
+def test_resuming_reactivates_an_assignment(db, clock):
+    scheduler = AssignmentScheduler(db, timeout=60)
+    items = scheduler.assign("a", 1, POOL, 2)
+    clock.now += 61
+    assert scheduler.assign("a", 1, POOL, 2) == items
+    coverage = scheduler.coverage(1)
+    assert all(coverage[tuple(pair)] == 1 for pair in items)
+
+
+def test_target_caps_raters_when_the_pool_is_large_enough(db, clock, caplog):
+    # 4 per label at 1 rater each, 1 per label per session: 4 sessions
+    assert pool_capacity(POOL, 2, 1) == 4
+    scheduler = AssignmentScheduler(db, target=1, expected_sessions=4)
+    for annotator in "abcd":
+        assert len(scheduler.assign(annotator, 1, POOL, 2)) == 2
+    with caplog.at_level(logging.WARNING, logger="assignment"):
+        assert scheduler.assign("e", 1, POOL, 2) == []
+    assert "e gets 0 of 2" in caplog.text
+
+
+def test_target_is_ignored_for_a_small_pool(db, clock, caplog):
+    scheduler = AssignmentScheduler(db, target=3, expected_sessions=10)
+    with caplog.at_level(logging.WARNING, logger="assignment"):
+        for annotator in "abcdefghij":
+            assert scheduler.assign(annotator, 1, POOL, None) == POOL
+    assert "not capping raters" in caplog.text
+
+
+def test_concurrent_sessions_are_balanced(db):
+    scheduler = AssignmentScheduler(db)
+    barrier = threading.Barrier(16)
+
+    def session(n):
+        barrier.wait()
+        scheduler.assign(f"rater {n}", 1, POOL, 2)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(scheduler.coverage(1).values()) == {4}
+
+
+def test_upgrades_an_old_database(db, clock):
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE assignments (annotator TEXT NOT NULL, phase INTEGER NOT NULL, "
+                     "qid INTEGER NOT NULL, label INTEGER NOT NULL, assigned_at REAL NOT NULL, "
+                     "PRIMARY KEY (annotator, phase, qid, label))")
+    conn.close()
+    scheduler = AssignmentScheduler(db)
+    scheduler.assign("a", 1, POOL, 2)
+    scheduler.complete("a", 1)
+    assert Counter(scheduler.coverage(1).values()) == Counter({1: 2})
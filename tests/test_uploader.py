@@ -0,0 +1,176 @@
+import base64
+import json
+import os
+import time
+
+import pytest
+
+import uploader
+from fake_github import FakeGitHub
+from uploader import GitHubUploader
+
+REPO = "o/r"
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def write_job(outbox, job_id, files, suffix=".json"):
+    entries = [{"path": path, "content": base64.b64encode(data).decode()} for path, data in files.items()]
+    path = os.path.join(outbox, f"{job_id}{suffix}")
+    with open(path, "w") as f:
+        json.dump({"id": job_id, "message": f"job {job_id}", "files": entries}, f)
+    return path
+
+
+def dead_pid():
+    pid = 2 ** 22 - 1
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid -= 1
+
+
+@pytest.fixture
+def fake():
+    fake = FakeGitHub().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    path = tmp_path / "outbox"
+    path.mkdir()
+    return str(path)
+
+
+def make_uploader(fake, outbox, **kwargs):
+    kwargs = {"base_delay": 0.01, "max_delay": 0.05, **kwargs}
+    return GitHubUploader("token", REPO, api_url=fake.url, outbox_dir=outbox, **kwargs)
+
+
+def test_recovers_outbox_in_one_commit(fake, outbox):
+    write_job(outbox, "1-a", {"results/a.csv": b"a"})
+    write_job(outbox, "2-b", {"results/b.csv": b"b", "results/a.csv": b"a2"})
+    # claimed by a process that died mid-upload
+    write_job(outbox, "3-c", {"results/c.csv": b"c"}, suffix=f".json.{dead_pid()}.claimed")
+
+    up = make_uploader(fake, outbox)
+    wait_for(lambda: all(up.is_done(j) for j in ("1-a", "2-b", "3-c")))
+
+    assert fake.commit_count == 1
+    assert fake.files() == {"results/a.csv": b"a2", "results/b.csv": b"b", "results/c.csv": b"c"}
+    assert os.listdir(outbox) == []
+
+
+def test_retries_transient_errors(fake, outbox, tmp_path):
+    local = tmp_path / "r.csv"
+    local.write_bytes(b"r")
+    fake.fail_requests = 3
+
+    up = make_uploader(fake, outbox)
+    job_id = up.submit([(str(local), "results/r.csv")])
+    wait_for(lambda: up.is_done(job_id))
+
+    assert fake.files() == {"results/r.csv": b"r"}
+
+
+def test_permanent_error_dead_letters_only_the_bad_job(fake, outbox, tmp_path):
+    write_job(outbox, "1-bad", {"results/a//b.csv": b"x"})
+    write_job(outbox, "2-good", {"results/good.csv": b"g"})
+    with open(os.path.join(outbox, "3-corrupt.json"), "w") as f:
+        f.write("{not json")
+
+    up = make_uploader(fake, outbox)
+    wait_for(lambda: up.is_done("2-good"))
+
+    assert fake.files() == {"results/good.csv": b"g"}
+    wait_for(lambda: sorted(os.listdir(os.path.join(outbox, "dead"))) == ["1-bad.json", "3-corrupt.json"])
+
+    # the worker is still serving later submissions
+    local = tmp_path / "later.csv"
+    local.write_bytes(b"l")
+    job_id = up.submit([(str(local), "results/later.csv")])
+    wait_for(lambda: up.is_done(job_id))
+    assert fake.files()["results/later.csv"] == b"l"
+
+
+def test_gives_up_and_releases_after_max_attempts(fake, outbox, tmp_path):
+    local = tmp_path / "r.csv"
+    local.write_bytes(b"r")
+    fake.fail_requests = 1000
+
+    up = make_uploader(fake, outbox, max_attempts=3)
+    job_id = up.submit([(str(local), "results/r.csv")])
+    wait_for(lambda: os.listdir(outbox) == [f"{job_id}.json"])
+    assert not up.is_done(job_id)
+
+    # later jobs are not stuck behind it
+    fake.fail_requests = 0
+    later = up.submit([(str(local), "results/later.csv")])
+    wait_for(lambda: up.is_done(later))
+    # the released job is uploaded by the next process on this outbox
+    restarted = make_uploader(fake, outbox)
+    wait_for(lambda: restarted.is_done(job_id))
+    assert set(fake.files()) == {"results/r.csv", "results/later.csv"}
+
+
+def test_released_jobs_are_retried_without_a_restart(fake, outbox, tmp_path):
+    local = tmp_path / "r.csv"
+    local.write_bytes(b"r")
+    fake.fail_requests = 1000
+
+    up = make_uploader(fake, outbox, max_attempts=2, rescan_interval=0.2)
+    job_id = up.submit([(str(local), "results/r.csv")])
+    # given up on and released, so only the rescan can bring it back
+    wait_for(lambda: os.path.exists(os.path.join(outbox, f"{job_id}.json")))
+    fake.fail_requests = 0
+    wait_for(lambda: up.is_done(job_id))
+    assert fake.files() == {"results/r.csv": b"r"}
+
+
+def test_rejected_ref_update_is_permanent(fake, outbox, tmp_path):
+    local = tmp_path / "r.csv"
+    local.write_bytes(b"r")
+    fake.protected = True
+
+    up = make_uploader(fake, outbox)
+    job_id = up.submit([(str(local), "results/r.csv")])
+    wait_for(lambda: os.path.exists(os.path.join(outbox, "dead", f"{job_id}.json")))
+    requests_made = fake.request_count
+
+    fake.protected = False
+    later = up.submit([(str(local), "results/later.csv")])
+    wait_for(lambda: up.is_done(later))
+    # one attempt for the rejected job: no hot loop of rebuilt commits
+    assert requests_made <= 10
+    assert fake.files() == {"results/later.csv": b"r"}
+
+
+def test_failed_claim_releases_the_batch(fake, outbox, monkeypatch):
+    write_job(outbox, "1-a", {"results/a.csv": b"a"})
+    write_job(outbox, "2-b", {"results/b.csv": b"b"})
+    load = json.load
+    failures = []
+
+    def flaky_load(f):
+        if not failures:
+            failures.append(f.name)
+            raise OSError("read error")
+        return load(f)
+
+    monkeypatch.setattr(uploader.json, "load", flaky_load)
+    up = make_uploader(fake, outbox, rescan_interval=0.2)
+    wait_for(lambda: up.is_done("1-a") and up.is_done("2-b"))
+    assert failures and failures[0].endswith(".claimed")
+    assert os.listdir(outbox) == []
@@ -0,0 +1,319 @@
+import base64
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+import requests
+
+from instrumentation import count, span
+from io_utils import atomic_path
+
+API_URL = "https://api.github.com"
+OUTBOX_DIR = "results/outbox"
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    pass
+
+
+class ConflictError(UploadError):
+    """The branch moved while we were building a commit."""
+
+
+class PermanentError(UploadError):
+    """A 4xx that retrying cannot fix: bad token, unknown repo or branch, invalid path."""
+
+
+# 4xx statuses worth retrying; every other 4xx is a PermanentError
+RETRYABLE_4XX = {408, 409, 429}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class GitHubUploader:
+    """
+    Background uploader for result files.
+
+    submit() snapshots the files into a JSON job in a durable on-disk outbox
+    and returns immediately. A worker thread drains the outbox, groups every
+    pending job into a single commit through the Git data (trees) API and
+    retries with exponential backoff, up to `max_attempts` times (lost races
+    included). Jobs left in the outbox, by a previous process or after
+    giving up, are picked up again on start and by a rescan of the outbox
+    every `rescan_interval` seconds.
+
+    A job the API rejects permanently (a 4xx other than a rate limit or
+    conflict) is moved to <outbox>/dead, after the rest of its batch has
+    been uploaded without it, so one bad job never blocks the others.
+
+    Several processes may share one outbox: a worker claims a job by renaming
+    it to <job>.<pid>.claimed, so each job is uploaded by exactly one of them.
+    """
+
+    def __init__(self, token, repo, branch=None, api_url=API_URL, outbox_dir=OUTBOX_DIR,
+                 batch_size=50, base_delay=1.0, max_delay=60.0, max_attempts=10, rescan_interval=300.0,
+                 timeout=30):
+        self.repo = repo
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.outbox_dir = outbox_dir
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.rescan_interval = rescan_interval
+        self.timeout = timeout
+        self.dead_dir = os.path.join(outbox_dir, "dead")
+
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.session.headers["Accept"] = "application/vnd.github+json"
+
+        self.queue = queue.Queue()
+        self.done = set()
+        os.makedirs(outbox_dir, exist_ok=True)
+        self._scan()
+
+        self.worker = threading.Thread(target=self._run, name="github-uploader", daemon=True)
+        self.worker.start()
+
+    # -----------------------
+    # PUBLIC API
+    # -----------------------
+    def submit(self, files, message="Upload annotation results"):
+        """
+        Queue `files`, a list of (local_path, github_path), for upload.
+        Returns the job id.
+        """
+        entries = []
+        for local_path, github_path in files:
+            with open(local_path, "rb") as f:
+                content = base64.b64encode(f.read()).decode()
+            entries.append({"path": github_path, "content": content})
+
+        # time-prefixed names keep the outbox in submission order
+        job_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        job_path = os.path.join(self.outbox_dir, f"{job_id}.json")
+        with atomic_path(job_path) as tmp:
+            with open(tmp, "w") as f:
+                json.dump({"id": job_id, "message": message, "files": entries}, f)
+                f.flush()
+                os.fsync(f.fileno())
+        self.queue.put(job_path)
+        return job_id
+
+    def is_done(self, job_id):
+        return job_id in self.done
+
+    def pending(self):
+        return self.queue.qsize()
+
+    # -----------------------
+    # WORKER
+    # -----------------------
+    def _scan(self):
+        """Queue every unclaimed job in the outbox, releasing claims of processes that died."""
+        for name in sorted(os.listdir(self.outbox_dir)):
+            path = os.path.join(self.outbox_dir, name)
+            if name.endswith(".claimed"):
+                job_path, pid = path[:-len(".claimed")].rsplit(".", 1)
+                if _pid_alive(int(pid)):
+                    continue
+                # claimed by a process that died mid-upload; release it
+                try:
+                    os.replace(path, job_path)
+                except FileNotFoundError:
+                    continue  # released by another process first
+                path = job_path
+            elif not name.endswith(".json"):
+                continue
+            self.queue.put(path)
+
+    def _run(self):
+        next_scan = time.monotonic() + self.rescan_interval
+        while True:
+            try:
+                batch = [self.queue.get(timeout=max(0.0, next_scan - time.monotonic()))]
+            except queue.Empty:
+                batch = []
+            if time.monotonic() >= next_scan:
+                # jobs released after max_attempts (or left by other processes) get another go
+                try:
+                    self._scan()
+                except OSError:
+                    logger.exception("Could not scan the outbox")
+                next_scan = time.monotonic() + self.rescan_interval
+                if not batch:
+                    continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._upload(self._claim(batch))
+            except Exception:
+                # never let the thread die; unfinished jobs go back to the outbox. Released
+                # from `batch`, since _claim may have failed after renaming some of them
+                count("upload.error")
+                logger.exception("Uploader failed on a batch of %d job(s)", len(batch))
+                claimed = {self._claimed_path(path) for path in batch}
+                try:
+                    self._release([(path, None) for path in sorted(claimed) if os.path.exists(path)])
+                except OSError:
+                    logger.exception("Could not release claimed jobs")
+
+    def _claimed_path(self, job_path):
+        return f"{job_path}.{os.getpid()}.claimed"
+
+    def _claim(self, batch):
+        jobs = []
+        for job_path in sorted(set(batch)):
+            claimed = self._claimed_path(job_path)
+            try:
+                os.rename(job_path, claimed)
+            except FileNotFoundError:
+                continue  # already uploaded, here or by another process
+            try:
+                with open(claimed) as f:
+                    job = json.load(f)
+                if "id" not in job or not isinstance(job.get("files"), list):
+                    raise ValueError("no id or files")
+            except (ValueError, AttributeError) as e:
+                self._dead_letter(claimed, f"unreadable job file: {e!r}")
+                continue
+            jobs.append((claimed, job))
+        return jobs
+
+    def _upload(self, jobs):
+        if not jobs:
+            return
+        try:
+            landed = self._commit_with_retry(jobs)
+        except PermanentError as e:
+            if len(jobs) == 1:
+                self._dead_letter(jobs[0][0], str(e))
+                return
+            # find the offending job(s): upload the batch one job at a time
+            for job in jobs:
+                self._upload([job])
+            return
+        if landed:
+            self._finish(jobs)
+        else:
+            self._release(jobs)
+
+    def _commit_with_retry(self, jobs):
+        """True once the commit lands, False after max_attempts failures; PermanentError is raised."""
+        attempt = 0
+        while True:
+            try:
+                with span("upload.commit", jobs=len(jobs), attempt=attempt):
+                    self._commit([job for _, job in jobs])
+                return True
+            except ConflictError as e:
+                # another uploader won the race; rebuild on the new head right away
+                count("upload.conflict")
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    logger.error("Giving up on %d job(s) after %d attempts: %s", len(jobs), attempt, e)
+                    return False
+                time.sleep(random.uniform(0, 0.1 * self.base_delay))
+            except PermanentError:
+                raise
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    logger.error("Giving up on %d job(s) after %d attempts: %s", len(jobs), attempt, e)
+                    return False
+                count("upload.retry")
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning("Upload of %d job(s) failed (attempt %d): %s; retrying in %.1fs",
+                               len(jobs), attempt, e, delay)
+                time.sleep(delay)
+
+    def _finish(self, jobs):
+        for job_path, job in jobs:
+            os.remove(job_path)
+            self.done.add(job["id"])
+        count("upload.jobs", len(jobs))
+
+    def _release(self, jobs):
+        # back to <job>.json: queued again by the next outbox scan, here or in another process
+        for job_path, _ in jobs:
+            os.replace(job_path, job_path.rsplit(".", 2)[0])
+        if jobs:
+            count("upload.gave_up", len(jobs))
+
+    def _dead_letter(self, job_path, reason):
+        os.makedirs(self.dead_dir, exist_ok=True)
+        dead = os.path.join(self.dead_dir, os.path.basename(job_path.rsplit(".", 2)[0]))
+        os.replace(job_path, dead)
+        count("upload.dead_letter")
+        logger.error("Moved job %s to %s: %s", os.path.basename(dead), self.dead_dir, reason)
+
+    def _check(self, r, what):
+        if r.status_code in (200, 201):
+            return
+        message = f"{what} failed ({r.status_code}): {r.text[:200]}"
+        rate_limited = r.status_code == 403 and r.headers.get("X-RateLimit-Remaining") == "0"
+        if 400 <= r.status_code < 500 and r.status_code not in RETRYABLE_4XX and not rate_limited:
+            raise PermanentError(message)
+        raise UploadError(message)
+
+    def _request(self, method, path, **kwargs):
+        r = self.session.request(method, f"{self.api_url}/repos/{self.repo}/{path}",
+                                 timeout=self.timeout, **kwargs)
+        if r.status_code == 422 and method == "PATCH":
+            raise ConflictError(f"{method} {path} was not a fast forward")
+        self._check(r, f"{method} {path}")
+        return r.json()
+
+    def _commit(self, jobs):
+        if self.branch is None:
+            r = self.session.get(f"{self.api_url}/repos/{self.repo}", timeout=self.timeout)
+            self._check(r, "GET repo")
+            self.branch = r.json()["default_branch"]
+
+        # later jobs win when several touch the same path
+        files = {}
+        for job in jobs:
+            for entry in job["files"]:
+                files[entry["path"]] = entry["content"]
+
+        head = self._request("GET", f"git/ref/heads/{self.branch}")["object"]["sha"]
+        base_tree = self._request("GET", f"git/commits/{head}")["tree"]["sha"]
+
+        tree = []
+        for path, content in files.items():
+            blob = self._request("POST", "git/blobs", json={"content": content, "encoding": "base64"})
+            tree.append({"path": path, "mode": "100644", "type": "blob", "sha": blob["sha"]})
+        new_tree = self._request("POST", "git/trees", json={"base_tree": base_tree, "tree": tree})
+
+        message = jobs[0]["message"] if len(jobs) == 1 else f"Upload annotation results ({len(jobs)} batches)"
+        commit = self._request("POST", "git/commits",
+                               json={"message": message, "tree": new_tree["sha"], "parents": [head]})
+        try:
+            self._request("PATCH", f"git/refs/heads/{self.branch}", json={"sha": commit["sha"], "force": False})
+        except ConflictError:
+            # a race only if someone else moved the branch; the retry rebuilds on the new head.
+            # Otherwise the update itself was refused (e.g. a protected branch)
+            if self._request("GET", f"git/ref/heads/{self.branch}")["object"]["sha"] == head:
+                raise PermanentError(f"Update of {self.branch} was rejected without the branch moving") from None
+            raise
+        logger.info("Uploaded %d file(s) in commit %s", len(files), commit["sha"][:7])